@@ -0,0 +1,267 @@
+""" Vectorized version of Driver.plan for every planning driver in a timestep.
+
+plan_all computes the same acceleration changes as calling Driver.plan on each driver against the same snapshot of
+the world: every (driver, leader) pair and every (driver, visible cross traffic) pair is evaluated at once with
+NumPy, the STOP/FOLLOW/GO branches of Driver._adjust_acceleration_for_other_driver, the perpendicular and traffic
+light rules are applied with masks, and the changes are reduced with a per-driver min. Arithmetic follows the scalar code operation by operation so
+the results match it exactly.
+"""
+import numpy as np
+
+from constants import (ROUNDING, SAFE_GAP_IN_SECONDS, MAX_CARE_RANGE, MIN_FOLLOWING_DISTANCE,
+                       PERPENDICULAR_FOLLOWING_DISTANCE)
+from signal import Signal, TrafficLightColor
+from utils import heading_of
+
+
+def _min_nonnegative_root(a, b, c):
+    """ Vectorized min(t for t in quadratic_equation(a, b, c) if t >= 0), NaN where there is none """
+    roots = np.full(a.shape, np.nan)
+    discriminant = b * b - 4 * (a * c)
+    real = discriminant >= 0
+    linear = real & (a == 0) & (b != 0)
+    quadratic = real & (a != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        linear_root = -c / b
+        root = np.sqrt(np.where(quadratic, discriminant, 0))
+        root_1 = (-b + root) / (2 * a)
+        root_2 = (-b - root) / (2 * a)
+    roots[linear & (linear_root >= 0)] = linear_root[linear & (linear_root >= 0)]
+    root_1 = np.where(quadratic & (root_1 >= 0), root_1, np.nan)
+    root_2 = np.where(quadratic & (root_2 >= 0), root_2, np.nan)
+    both = quadratic & ~(np.isnan(root_1) & np.isnan(root_2))
+    roots[both] = np.fmin(root_1, root_2)[both]
+    return roots
+
+
+def _dot(x0, y0, x1, y1):
+    """ Vectorized utils.dot """
+    norm = np.sqrt(x1 * x1 + y1 * y1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(norm == 0, 0.0, (x0 * x1 + y0 * y1) / norm)
+
+
+def _distance(x0, y0, x1, y1):
+    """ Vectorized utils.cal_distance """
+    a = x0 - x1
+    b = y0 - y1
+    return np.sqrt(a * a + b * b)
+
+
+def _when_hits(position, space, speed, acceleration):
+    """ Vectorized Driver._when_vehicle_hits_a_location_in_d, returns (time or NaN, distance) """
+    return _min_nonnegative_root(0.5 * acceleration, speed, position - space), space - position
+
+
+class _State:
+    """ Columns of the state Driver.plan reads, one row per driver """
+
+    def __init__(self, drivers):
+        vehicles = [driver.my_vehicle for driver in drivers]
+        self.x = np.array([v.x for v in vehicles], dtype=float)
+        self.y = np.array([v.y for v in vehicles], dtype=float)
+        rears = [v.get_rear() for v in vehicles]
+        self.rear_x = np.array([rear[0] for rear in rears], dtype=float)
+        self.rear_y = np.array([rear[1] for rear in rears], dtype=float)
+        self.speed = np.array([v.speed for v in vehicles], dtype=float)
+        self.acceleration = np.array([v.acceleration for v in vehicles], dtype=float)
+        self.angle = np.array([v.angle for v in vehicles], dtype=float)
+        headings = [heading_of(v.angle) for v in vehicles]
+        self.cos = np.array([heading.dx * 1.0 for heading in headings], dtype=float)
+        self.sin = np.array([heading.dy * 1.0 for heading in headings], dtype=float)
+        self.length = np.array([v.length for v in vehicles], dtype=float)
+        self.max_speed = np.array([v.max_speed for v in vehicles], dtype=float)
+        self.max_acceleration = np.array([v.max_acceleration for v in vehicles], dtype=float)
+        self.following_distance = np.array([driver.quality.following_distance for driver in drivers], dtype=float)
+        self.speeding = np.array([driver.quality.speeding for driver in drivers], dtype=float)
+        # Driver._get_direction_x_or_y
+        self.along_y = (self.angle % 180) == 90
+        self.safe_following_distance = np.maximum(SAFE_GAP_IN_SECONDS * np.abs(self.speed),
+                                                   self.length * MIN_FOLLOWING_DISTANCE) * self.following_distance
+
+
+def _closest(state, i, j):
+    """ Vectorized Driver.get_closest: the closest (my point, his point) of the four front/rear combinations """
+    candidates = [
+        (state.x[i], state.y[i], state.x[j], state.y[j]),
+        (state.x[i], state.y[i], state.rear_x[j], state.rear_y[j]),
+        (state.rear_x[i], state.rear_y[i], state.rear_x[j], state.rear_y[j]),
+        (state.rear_x[i], state.rear_y[i], state.x[j], state.y[j]),
+    ]
+    distances = np.stack([_distance(*candidate) for candidate in candidates])
+    # argmin picks the first of equal distances, like min() in get_closest
+    pick = np.argmin(distances, axis=0)
+    rows = np.arange(len(i))
+    closest = [np.stack([candidate[k] for candidate in candidates])[pick, rows] for k in range(4)]
+    return closest, distances[pick, rows]
+
+
+def _parallel_changes(state, i, j):
+    """ Vectorized Driver._adjust_acceleration_for_other_driver, NaN where it returns None """
+    (my_x, my_y, his_x, his_y), _ = _closest(state, i, j)
+    dx, dy = state.cos[i], state.sin[i]
+    distance = _dot(his_x - my_x, his_y - my_y, dx, dy)
+
+    # Driver._to_intercept
+    his_speed = _dot(state.cos[j] * state.speed[j], state.sin[j] * state.speed[j], dx, dy)
+    his_acceleration = _dot(state.cos[j] * state.acceleration[j], state.sin[j] * state.acceleration[j], dx, dy)
+    my_acceleration = np.where(state.speed[i] == 0, np.maximum(state.acceleration[i], 0), state.acceleration[i])
+    his_acceleration = np.where(state.speed[j] == 0, np.maximum(his_acceleration, 0), his_acceleration)
+    time = _min_nonnegative_root(0.5 * (his_acceleration - my_acceleration), his_speed - state.speed[i], distance)
+    no_time = np.isnan(time)
+
+    their_new_speed = np.maximum(np.where(no_time, state.speed[j], state.speed[j] + state.acceleration[j] * time), 0)
+    following_distance = state.following_distance[i]
+    stop = -state.max_acceleration[i] - state.acceleration[i]
+
+    ahead = distance > 0
+    too_close = distance < state.safe_following_distance[i]
+    follow = (~too_close
+              & (distance < SAFE_GAP_IN_SECONDS * MAX_CARE_RANGE * following_distance * state.speed[i])
+              & (their_new_speed > 0))
+    undecided = ~too_close & ~follow & ~no_time
+    stop_in_time = (undecided
+                    & ~(time > SAFE_GAP_IN_SECONDS * MAX_CARE_RANGE * following_distance)
+                    & (time <= SAFE_GAP_IN_SECONDS * following_distance))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        follow_acceleration = np.where(time == 0, -state.max_acceleration[i],
+                                       (their_new_speed - state.speed[i]) / np.abs(np.where(no_time, 1.0, time)))
+    changes = np.full(len(i), np.nan)
+    changes[follow] = (follow_acceleration - state.acceleration[i])[follow]
+    changes[too_close | stop_in_time] = stop[too_close | stop_in_time]
+    changes[~ahead] = np.nan
+    return changes
+
+
+def _perpendicular_changes(state, i, j):
+    """ Vectorized Driver._adjust_acceleration_for_other_driver_perpendicular, NaN where it returns None """
+    # Driver._to_intercept_perpendicular: they move along y, so I am measured along x, and vice versa
+    their_axis_y = state.along_y[j]
+    my_front = np.where(their_axis_y, state.x[i], state.y[i])
+    my_rear = np.where(their_axis_y, state.rear_x[i], state.rear_y[i])
+    their_front_in_mine = np.where(their_axis_y, state.x[j], state.y[j])
+    their_rear_in_mine = np.where(their_axis_y, state.rear_x[j], state.rear_y[j])
+    their_front = np.where(their_axis_y, state.y[j], state.x[j])
+    their_rear = np.where(their_axis_y, state.rear_y[j], state.rear_x[j])
+    my_front_in_theirs = np.where(their_axis_y, state.y[i], state.x[i])
+    my_rear_in_theirs = np.where(their_axis_y, state.rear_y[i], state.rear_x[i])
+
+    my_time_front, my_distance_front = _when_hits(my_front, their_front_in_mine, state.speed[i], state.acceleration[i])
+    my_time_rear, my_distance_rear = _when_hits(my_rear, their_rear_in_mine, state.speed[i], state.acceleration[i])
+    their_time_front, their_distance = _when_hits(their_front, my_front_in_theirs, state.speed[j],
+                                                  state.acceleration[j])
+    their_time_rear, _ = _when_hits(their_rear, my_rear_in_theirs, state.speed[j], state.acceleration[j])
+    distance = np.minimum(my_distance_front, my_distance_rear)
+
+    # utils.intervals_overlap with a SAFE_GAP_IN_SECONDS buffer
+    a0 = np.minimum(my_time_front, my_time_rear) - SAFE_GAP_IN_SECONDS
+    a1 = np.maximum(my_time_front, my_time_rear) + SAFE_GAP_IN_SECONDS
+    b0 = np.minimum(their_time_front, their_time_rear) - SAFE_GAP_IN_SECONDS
+    b1 = np.maximum(their_time_front, their_time_rear) + SAFE_GAP_IN_SECONDS
+    overlap = ((a0 <= b0) & (b0 <= a1)) | ((b0 <= a0) & (a0 <= b1))
+    intercepts = (~np.isnan(my_time_front) & ~np.isnan(my_time_rear) & ~np.isnan(their_time_front)
+                  & ~np.isnan(their_time_rear) & overlap)
+
+    _, direct_distance = _closest(state, i, j)
+    safe_following_distance = state.safe_following_distance[i] * PERPENDICULAR_FOLLOWING_DISTANCE
+    ahead = distance > 0
+    yield_now = ahead & (direct_distance <= safe_following_distance) & (their_distance <= distance)
+
+    t = their_time_rear + SAFE_GAP_IN_SECONDS
+    with np.errstate(divide='ignore', invalid='ignore'):
+        new_acceleration = (2.0 / (t * t)) * (distance - state.speed[i] * t)
+    changes = np.full(len(i), np.nan)
+    adjust = ahead & ~yield_now & intercepts
+    changes[adjust] = (new_acceleration - state.acceleration[i])[adjust]
+    changes[yield_now] = -state.max_acceleration[i][yield_now]
+    return changes
+
+
+def _traffic_light_changes(state, lanes, traffic_light):
+    """ Vectorized Driver._adjust_acceleration_for_traffic_light, NaN where it returns None """
+    count = len(lanes)
+    changes = np.full(count, np.nan)
+    red = np.array([traffic_light.get_light(lane) != TrafficLightColor.GREEN for lane in lanes], dtype=bool)
+    if not red.any():
+        return changes
+    rows = np.flatnonzero(red)
+    positions = [traffic_light.get_position(lanes[row]) for row in rows]
+    its_x = np.array([position[0] for position in positions], dtype=float)
+    its_y = np.array([position[1] for position in positions], dtype=float)
+    x, y = state.x[rows], state.y[rows]
+    dx, dy = state.cos[rows], state.sin[rows]
+    speed, acceleration = state.speed[rows], state.acceleration[rows]
+    max_acceleration = state.max_acceleration[rows]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stopping_time = speed / max_acceleration
+    ahead = _dot(its_x - x, its_y - y, dx, dy) > 0
+    time, distance = _when_hits(x * dx + y * dy, its_x * dx + its_y * dy, speed, acceleration)
+    stop = -max_acceleration - acceleration
+    close = distance < state.safe_following_distance[rows]
+    has_time = ~close & ~np.isnan(time)
+    stop_neatly = has_time & (time <= stopping_time)
+    stop_in_time = has_time & ~stop_neatly & (time <= SAFE_GAP_IN_SECONDS * state.following_distance[rows])
+
+    result = np.full(len(rows), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[stop_neatly] = (-speed / time - acceleration)[stop_neatly]
+    result[close | stop_in_time] = stop[close | stop_in_time]
+    result[~ahead] = np.nan
+    changes[rows] = result
+    return changes
+
+
+def plan_all(drivers: list, visible_objects: list[list], lanes: list, timestep_length: float,
+             traffic_light=Signal()) -> list[float]:
+    """ Return Driver.plan(visible_objects[k], lanes[k].get_speed_limit(), timestep_length, lanes[k], traffic_light)
+    for every drivers[k], computed together. As for Driver.plan, every lane must have been reorder()ed since the
+    drivers last moved.
+    """
+    if not drivers:
+        return []
+    # every driver that is planning or being looked at gets one row of state
+    rows = {}
+    everyone = []
+    for driver in drivers:
+        rows[driver] = len(everyone)
+        everyone.append(driver)
+    leaders = [driver.leader_in_sight(lane) for driver, lane in zip(drivers, lanes)]
+    for visible in visible_objects + [leaders]:
+        for driver in visible:
+            if driver is not None and driver not in rows:
+                rows[driver] = len(everyone)
+                everyone.append(driver)
+    state = _State(everyone)
+    count = len(drivers)
+    planners = np.arange(count)
+
+    # Driver._get_desired_acceleration_change
+    road_limit = np.array([lane.get_speed_limit() for lane in lanes], dtype=float)
+    max_possible_speed = np.minimum(state.max_speed[planners], road_limit * state.speeding[planners])
+    best = (max_possible_speed - state.speed[planners]) / timestep_length - state.acceleration[planners]
+
+    light = _traffic_light_changes(state, lanes, traffic_light)
+    best = np.fmin(best, light)
+
+    visible_i = [k for k, visible in enumerate(visible_objects) for _ in visible]
+    visible_j = [rows[driver] for visible in visible_objects for driver in visible]
+    leader_i = [k for k, leader in enumerate(leaders) if leader is not None]
+    leader_j = [rows[leader] for leader in leaders if leader is not None]
+    pair_i = np.array(visible_i + leader_i, dtype=int)
+    pair_j = np.array(visible_j + leader_j, dtype=int)
+    if len(pair_i):
+        controlled = np.array([traffic_light.controls(lane) for lane in lanes], dtype=bool)
+        # visible drivers going my way are left to the leader pairs
+        parallel = np.zeros(len(pair_i), dtype=bool)
+        parallel[len(visible_i):] = True
+        perpendicular = ~parallel & (state.along_y[pair_i] != state.along_y[pair_j])
+        changes = np.full(len(pair_i), np.nan)
+        changes[parallel] = _parallel_changes(state, pair_i[parallel], pair_j[parallel])
+        crossing = perpendicular & ~controlled[pair_i]
+        changes[crossing] = _perpendicular_changes(state, pair_i[crossing], pair_j[crossing])
+        pair_changes = np.full(count, np.inf)
+        np.minimum.at(pair_changes, pair_i, np.where(np.isnan(changes), np.inf, changes))
+        best = np.minimum(best, pair_changes)
+    return [round(float(change), ROUNDING) for change in best]
@@ -0,0 +1,58 @@
+""" Time Detector.detect_crashes (grid broad phase) against the all-pairs reference on two crossing roads.
+Run from the repository root: python -m benchmarks.bench_collision
+"""
+import argparse
+import random
+import time
+
+from collision_detector import Detector
+from driver import Driver, Quality
+from objects import GlobalObjectList
+from vehicle import Vehicle
+
+
+def build_world(count, road_length, seed=0):
+    """ Spread count vehicles over the four lanes of two crossing roads """
+    rng = random.Random(seed)
+    objects = GlobalObjectList()
+    for object_id in range(count):
+        angle = rng.choice([0, 90, 180, 270])
+        along = rng.uniform(-road_length / 2, road_length / 2)
+        lane_offset = 2.5 if angle in (0, 90) else -2.5
+        x, y = (along, lane_offset) if angle % 180 == 0 else (lane_offset, along)
+        vehicle = Vehicle(x=x, y=y, length=rng.choice([1.7, 3.75, 14.7]), speed=10, acceleration=0, max_speed=30,
+                          max_acceleration=5, max_angle=45, angle=angle, width=2)
+        objects[object_id] = Driver(object_id, vehicle, 200, (0, 0), Quality())
+    return objects
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--counts', type=int, nargs='+', default=[100, 1000, 10000, 30000])
+    parser.add_argument('--max-all-pairs', type=int, default=2000,
+                        help='largest world the quadratic reference is timed on')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    print(f"{'vehicles':>10} {'broad phase (ms)':>17} {'candidates':>11} {'all pairs (ms)':>15}")
+    for count in args.counts:
+        # keep the density of a busy road: one vehicle every ~10 m of lane
+        objects = build_world(count, road_length=max(count * 10 / 4, 300))
+        detector = Detector(objects)
+        broad_phase, crashed = timed(detector.detect_crashes, args.repeat)
+        all_pairs = '-'
+        if count <= args.max_all_pairs:
+            seconds, reference = timed(detector.detect_crashes_all_pairs, 1)
+            assert sorted(reference) == sorted(crashed)
+            all_pairs = f"{seconds * 1000:.1f}"
+        print(f"{count:>10} {broad_phase * 1000:>17.1f} {detector.candidate_pairs:>11} {all_pairs:>15}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+""" Measure the memory each live vehicle (its Driver, Vehicle and Quality) takes, and how long creating one takes.
+Run from the repository root: python -m benchmarks.bench_memory [--count 20000]
+
+Vehicles are made by a lane's own generator, as in a run, and kept alive in a list; the footprint is what
+tracemalloc sees allocated while making them, divided by their number.
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+from settings import Settings
+from simulation import Simulation
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_drivers(simulation: Simulation, count: int) -> list:
+    my_settings = simulation.settings
+    lane = simulation.lanes[0]
+    x0, y0 = lane.get_position(0)
+    endx, endy = lane.get_position(1)
+    generate = lane.generator.generate
+    return [generate(x0, y0, my_settings['visibility'], endx, endy, lane.get_speed_limit(), my_settings)
+            for _ in range(count)]
+
+
+def bench(count: int, settings_file: str, state_store: bool) -> dict:
+    my_settings = Settings(settings_file)
+    my_settings['loglevel'] = 'WARNING'
+    my_settings['state_store'] = state_store
+    simulation = Simulation(my_settings)
+    # warm up, so one-time allocations (caches, the store growing to count slots) are not counted
+    for driver in make_drivers(simulation, count):
+        driver.my_vehicle.release()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    drivers = make_drivers(simulation, count)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+    for driver in drivers:
+        driver.my_vehicle.release()
+    start = time.perf_counter()
+    make_drivers(simulation, count)
+    seconds = time.perf_counter() - start
+    return {'vehicles': len(drivers), 'state_store': state_store, 'bytes_per_vehicle': allocated / count,
+            'microseconds_per_vehicle': seconds / count * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--settings', default=os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+    args = parser.parse_args()
+    print(f"{'vehicles':>9} {'state_store':>12} {'bytes/vehicle':>14} {'us/vehicle':>11}")
+    for state_store in (False, True):
+        row = bench(args.count, args.settings, state_store)
+        print(f"{row['vehicles']:>9} {str(row['state_store']):>12} {row['bytes_per_vehicle']:>14.0f} "
+              f"{row['microseconds_per_vehicle']:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+""" Measure how much of a short run is interpreter and import startup, and how much reusing a process saves.
+Run from the repository root: python -m benchmarks.bench_startup
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+from settings import Settings
+from simulation import run, run_many
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def fresh_interpreters(settings_file, runs):
+    """ One new python process per run, like calling main.py from a shell loop """
+    command = [sys.executable, '-c',
+               'import sys; from settings import Settings; from simulation import run; run(Settings(sys.argv[1]))',
+               settings_file]
+    for _ in range(runs):
+        subprocess.run(command, cwd=REPO_ROOT, check=True)
+
+
+def _run_one(my_settings):
+    return run(my_settings).throughput
+
+
+def pool_of(my_settings, runs, workers, maxtasksperchild):
+    pool = multiprocessing.get_context('fork').Pool(workers, maxtasksperchild=maxtasksperchild)
+    try:
+        pool.map(_run_one, [my_settings] * runs)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--settings', default=os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+    parser.add_argument('--runs', type=int, default=32)
+    parser.add_argument('--timesteps', type=int, default=20, help='length of every run; short runs show startup')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    my_settings = Settings(args.settings)
+    my_settings['simulation_timesteps'] = args.timesteps
+    my_settings['loglevel'] = 'WARNING'
+    with tempfile.NamedTemporaryFile('w', suffix='.yaml', delete=False) as f:
+        yaml.safe_dump(dict(my_settings), f)
+    try:
+        results = [
+            ('new interpreter per run', timed(fresh_interpreters, f.name, args.runs)),
+            ('new worker per run', timed(pool_of, my_settings, args.runs, args.workers, 1)),
+            ('reused workers', timed(pool_of, my_settings, args.runs, args.workers, None)),
+            ('one process, back-to-back', timed(run_many, [my_settings] * args.runs)),
+        ]
+    finally:
+        os.remove(f.name)
+    print(f"{args.runs} runs of {args.timesteps} timesteps, {args.workers} workers")
+    print(f"{'mode':>26} {'total (s)':>10} {'per run (ms)':>13}")
+    for mode, seconds in results:
+        print(f"{mode:>26} {seconds:>10.2f} {seconds / args.runs * 1000:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+""" Compare the per-object Vehicle.update loop with one vectorized VehicleStateStore.update pass.
+Run from the repository root: python -m benchmarks.bench_state_store
+"""
+import argparse
+import time
+
+from state_store import VehicleStateStore, StoredVehicle
+from vehicle import Vehicle
+
+
+def build(count, store=None):
+    vehicles = []
+    for i in range(count):
+        kwargs = dict(x=float(i), y=0.0, length=4.0, speed=10.0, acceleration=(i % 5) - 2.0, max_speed=30.0,
+                      max_acceleration=5.0, max_angle=45.0, angle=(i % 4) * 90.0, width=2.0)
+        vehicles.append(StoredVehicle(store, **kwargs) if store is not None else Vehicle(**kwargs))
+    return vehicles
+
+
+def bench(count, steps, timestep_length=0.2):
+    vehicles = build(count)
+    start = time.perf_counter()
+    for _ in range(steps):
+        for vehicle in vehicles:
+            vehicle.update(timestep_length)
+    per_object = (time.perf_counter() - start) / steps
+
+    store = VehicleStateStore(capacity=count)
+    build(count, store)
+    start = time.perf_counter()
+    for _ in range(steps):
+        store.update(timestep_length)
+    vectorized = (time.perf_counter() - start) / steps
+    return per_object, vectorized
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--counts', type=int, nargs='+', default=[100, 1000, 10000, 50000])
+    args = parser.parse_args()
+    print(f"{'vehicles':>10} {'per-object (ms)':>16} {'vectorized (ms)':>16} {'speedup':>8}")
+    for count in args.counts:
+        per_object, vectorized = bench(count, args.steps)
+        print(f"{count:>10} {per_object * 1000:>16.3f} {vectorized * 1000:>16.3f} {per_object / vectorized:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
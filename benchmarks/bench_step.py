@@ -0,0 +1,171 @@
+""" Time every phase of a simulation step on synthetic worlds of 10 to 10k vehicles and save the results as JSON.
+Run from the repository root: python -m benchmarks.bench_step --out benchmarks/results/today.json
+Compare two runs: python -m benchmarks.bench_step --compare old.json new.json
+
+The world is the demo settings with the roads stretched so every lane holds its share of the vehicles, one every
+SPACING meters. Vehicles are made by the lanes' own generators, so they have the usual types and drivers.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+
+from settings import Settings
+from simulation import Simulation
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ('generation', 'perception', 'planning', 'integration', 'crash_detection', 'end_detection', 'rendering')
+# meters of lane per vehicle
+SPACING = 20
+
+
+def build(count: int, settings_file: str) -> Simulation:
+    my_settings = Settings(settings_file)
+    my_settings['loglevel'] = 'WARNING'
+    lane_count = sum(len(road['lanes']) for road in my_settings['roads'])
+    per_lane = max(count // lane_count, 1)
+    for road in my_settings['roads']:
+        road['length'] = max(road['length'], per_lane * SPACING)
+    simulation = Simulation(my_settings)
+    world = simulation.world
+    for lane in simulation.lanes:
+        endx, endy = lane.get_position(1)
+        for k in range(per_lane):
+            x, y = lane.get_position((k + 0.5) / per_lane)
+            driver = lane.generator.generate(x, y, my_settings['visibility'], endx, endy, lane.get_speed_limit(),
+                                             my_settings)
+            world[driver.object_id] = driver
+            lane.add(driver.object_id)
+    return simulation
+
+
+def time_step(simulation: Simulation) -> dict:
+    """ Run one step phase by phase, the way Simulation.step does, and return the seconds each phase took.
+    Nothing is removed at the end, so the number of vehicles stays the same from step to step.
+    """
+    world = simulation.world
+    timings = {}
+
+    start = time.perf_counter()
+    simulation._generate(simulation.the_time)
+    timings['generation'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    simulation._index_traffic()
+    planners = []
+    for driver in world.values():
+        lane = world.get_lane_of(driver.object_id)
+        if lane is not None:
+            planners.append((driver, lane, simulation._crossing_traffic(driver, lane)))
+    timings['perception'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for driver, lane, visible in planners:
+        driver.accelerate(driver.plan(visible, lane.get_speed_limit(), simulation.timestep_length, lane,
+                                      traffic_light=world.get_light()))
+    timings['planning'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    world.get_light().update(simulation.the_time)
+    simulation._update_vehicles()
+    timings['integration'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    simulation.detector.detect_crashes()
+    timings['crash_detection'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for lane in simulation.lanes:
+        lane.detect_end()
+    timings['end_detection'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    world.draw()
+    timings['rendering'] = time.perf_counter() - start
+
+    simulation.loop += 1
+    return timings
+
+
+def bench(count: int, steps: int, settings_file: str) -> list[dict]:
+    simulation = build(count, settings_file)
+    vehicles = len(simulation.world)
+    totals = dict.fromkeys(PHASES, 0.0)
+    for _ in range(steps):
+        for phase, seconds in time_step(simulation).items():
+            totals[phase] += seconds
+    results = []
+    for phase in PHASES:
+        per_step = totals[phase] / steps
+        results.append({'vehicles': vehicles, 'phase': phase, 'seconds_per_step': per_step,
+                        'vehicle_steps_per_second': vehicles / per_step if per_step else None})
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def print_results(results: list[dict]):
+    print(f"{'vehicles':>9} {'phase':>16} {'ms/step':>10} {'vehicle-steps/s':>16}")
+    for row in results:
+        rate = row['vehicle_steps_per_second']
+        rate = f'{rate:>16,.0f}' if rate is not None else f"{'-':>16}"
+        print(f"{row['vehicles']:>9} {row['phase']:>16} {row['seconds_per_step'] * 1000:>10.3f} {rate}")
+
+
+def compare(old_file: str, new_file: str):
+    """ Print how much faster (>1) or slower (<1) every phase got from the old results to the new ones """
+    with open(old_file) as f:
+        old = {(row['vehicles'], row['phase']): row for row in json.load(f)['results']}
+    with open(new_file) as f:
+        new = json.load(f)['results']
+    print(f"{'vehicles':>9} {'phase':>16} {'old ms':>10} {'new ms':>10} {'speedup':>8}")
+    for row in new:
+        before = old.get((row['vehicles'], row['phase']))
+        if before is None:
+            continue
+        old_ms, new_ms = before['seconds_per_step'] * 1000, row['seconds_per_step'] * 1000
+        speedup = f'{old_ms / new_ms:>8.2f}' if new_ms else f"{'-':>8}"
+        print(f"{row['vehicles']:>9} {row['phase']:>16} {old_ms:>10.3f} {new_ms:>10.3f} {speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--steps', type=int, default=5, help='steps timed for every world')
+    parser.add_argument('--settings', default=os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+    parser.add_argument('--out', default=None, help='JSON file to save the results to')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two saved results and exit')
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = []
+    for count in args.counts:
+        results += bench(count, args.steps, args.settings)
+    print_results(results)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        report = {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                  'commit': git_commit(),
+                  'python': platform.python_version(),
+                  'machine': platform.machine(),
+                  'steps': args.steps,
+                  'settings': os.path.relpath(args.settings, REPO_ROOT),
+                  'results': results}
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Saved to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+""" Save a whole Simulation to a compressed file and load it back, to resume a run or to start what-if runs from it.
+
+A checkpoint is the pickled Simulation: the world with every driver, vehicle and lane, the generators, the traffic
+light, the random streams (so a resumed run continues bit for bit) and the metrics so far. The open trace file is not
+part of it; see Simulation.reopen_trace.
+"""
+import os
+import pickle
+import zlib
+
+# identifies checkpoint files and their layout
+MAGIC = b'SIMCKPT1'
+
+
+def dumps(simulation) -> bytes:
+    return MAGIC + zlib.compress(pickle.dumps(simulation, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def loads(data: bytes):
+    if not data.startswith(MAGIC):
+        raise ValueError('Not a simulation checkpoint')
+    return pickle.loads(zlib.decompress(data[len(MAGIC):]))
+
+
+def save_checkpoint(simulation, file_name: str):
+    """ Write the checkpoint next to the old one and swap it in, so a crash mid-write keeps the last good one """
+    temporary_name = f'{file_name}.tmp'
+    with open(temporary_name, 'wb') as f:
+        f.write(dumps(simulation))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_name, file_name)
+
+
+def load_checkpoint(file_name: str):
+    """ Return the Simulation saved in the file. Every call returns an independent copy. """
+    with open(file_name, 'rb') as f:
+        return loads(f.read())
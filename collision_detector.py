@@ -1,5 +1,9 @@
+from collections import defaultdict
+from math import floor
+
 from objects import GlobalObjectList
 import logging
+from tracing import trace
 
 logging.getLogger('DetectorLogging')
 
@@ -10,55 +14,102 @@ class Detector:
                  global_objects_list: GlobalObjectList):
 
         self._global_objects_list = global_objects_list
+        # number of pairs that reached the narrow phase in the last detect_crashes call
+        self.candidate_pairs = 0
 
     def detect_crashes(self) -> list[int]:
         """ Return a list of crashed objects
         each crash is represented as a tuple of the object ids involved
+        Broad phase: bucket the bounding box of every vehicle into a uniform grid.
+        Narrow phase: the exact same-angle and perpendicular tests, only for pairs whose boxes overlap.
         """
         crashes = set()
+        boxes = []
+        largest = 1.0
+        for driver in self._global_objects_list.values():
+            vehicle = driver.my_vehicle
+            rear_x, rear_y = vehicle.get_rear()
+            box = (min(vehicle.x, rear_x), max(vehicle.x, rear_x),
+                   min(vehicle.y, rear_y), max(vehicle.y, rear_y),
+                   driver, (rear_x, rear_y))
+            largest = max(largest, box[1] - box[0], box[3] - box[2])
+            boxes.append(box)
+
+        # with cells as big as the largest vehicle, every box touches at most 2x2 cells
+        cells = defaultdict(list)
+        for index, (min_x, max_x, min_y, max_y, _, _) in enumerate(boxes):
+            for cell_x in range(floor(min_x / largest), floor(max_x / largest) + 1):
+                for cell_y in range(floor(min_y / largest), floor(max_y / largest) + 1):
+                    cells[cell_x, cell_y].append(index)
+
+        candidates = set()
+        for in_cell in cells.values():
+            for a in range(len(in_cell)):
+                for b in range(a + 1, len(in_cell)):
+                    candidates.add((in_cell[a], in_cell[b]))
+        self.candidate_pairs = len(candidates)
+
+        for a, b in candidates:
+            min_x, max_x, min_y, max_y, i, i_rear = boxes[a]
+            other_min_x, other_max_x, other_min_y, other_max_y, j, j_rear = boxes[b]
+            if other_min_x > max_x or min_x > other_max_x or other_min_y > max_y or min_y > other_max_y:
+                continue
+            if self._crashed(i, i_rear, j, j_rear) or self._crashed(j, j_rear, i, i_rear):
+                crashes.add(i.object_id)
+                crashes.add(j.object_id)
+        return list(crashes)
+
+    def detect_crashes_all_pairs(self) -> list[int]:
+        """ Reference implementation of detect_crashes that checks every ordered pair of objects """
+        crashes = set()
         for i in self._global_objects_list.values():
             for j in self._global_objects_list.values():
                 if i is j:
                     continue
-                i_rear_x, i_rear_y = i.my_vehicle.get_rear()
-                j_rear_x, j_rear_y = j.my_vehicle.get_rear()
-
-                if i.my_vehicle.angle == j.my_vehicle.angle:
-                    if ((i.my_vehicle.x <= j.my_vehicle.x <= i_rear_x
-                         and i.my_vehicle.y <= j.my_vehicle.y <= i_rear_y)
-                            or (i.my_vehicle.x <= j_rear_x <= i_rear_x
-                                and i.my_vehicle.y <= j_rear_y <= i_rear_y)
-                            or (i_rear_x <= j.my_vehicle.x <= i.my_vehicle.x
-                                and i_rear_y <= j.my_vehicle.y <= i.my_vehicle.y)
-                            or (j_rear_x <= i.my_vehicle.x <= j.my_vehicle.x
-                                and j_rear_y <= i.my_vehicle.y <= j.my_vehicle.y)
-                            or (i.my_vehicle.x >= j.my_vehicle.x >= i_rear_x
-                                and i.my_vehicle.y >= j.my_vehicle.y >= i_rear_y)
-                            or (i.my_vehicle.x >= j_rear_x >= i_rear_x
-                                and i.my_vehicle.y >= j_rear_y >= i_rear_y)
-                            or (i_rear_x >= j.my_vehicle.x >= i.my_vehicle.x
-                                and i_rear_y >= j.my_vehicle.y >= i.my_vehicle.y)
-                            or (j_rear_x >= i.my_vehicle.x >= j.my_vehicle.x
-                                and j_rear_y >= i.my_vehicle.y >= j.my_vehicle.y)):
-
-                        crashes.add(i.object_id)
-                        crashes.add(j.object_id)
-                elif i.my_vehicle.angle % 180 == 0 and j.my_vehicle.angle % 180 == 90:
-                    i_max_x = max(i.my_vehicle.x, i_rear_x)
-                    i_min_x = min(i.my_vehicle.x, i_rear_x)
-                    i_y = i.my_vehicle.y
-
-                    j_max_y = max(j.my_vehicle.y, j_rear_y)
-                    j_min_y = min(j.my_vehicle.y, j_rear_y)
-                    j_x = j.my_vehicle.x
-                    if (i_min_x <= j_x <= i_max_x
-                    and j_min_y <= i_y <= j_max_y):
-                        crashes.add(i.object_id)
-                        crashes.add(j.object_id)
-                        logging.info(f'crashed id loc 1={i.my_vehicle.x, i.my_vehicle.y}, loc 1 rear={i_rear_x, i_rear_y}, loc 2={j.my_vehicle.x, j.my_vehicle.y}, loc 2 rear={j_rear_x, j_rear_y}.')
-
+                if self._crashed(i, i.my_vehicle.get_rear(), j, j.my_vehicle.get_rear()):
+                    crashes.add(i.object_id)
+                    crashes.add(j.object_id)
         return list(crashes)
 
+    @staticmethod
+    def _crashed(i, i_rear, j, j_rear) -> bool:
+        """ Exact test of whether i has run into j, given the rear points of both """
+        i_rear_x, i_rear_y = i_rear
+        j_rear_x, j_rear_y = j_rear
+
+        if i.my_vehicle.angle == j.my_vehicle.angle:
+            if ((i.my_vehicle.x <= j.my_vehicle.x <= i_rear_x
+                 and i.my_vehicle.y <= j.my_vehicle.y <= i_rear_y)
+                    or (i.my_vehicle.x <= j_rear_x <= i_rear_x
+                        and i.my_vehicle.y <= j_rear_y <= i_rear_y)
+                    or (i_rear_x <= j.my_vehicle.x <= i.my_vehicle.x
+                        and i_rear_y <= j.my_vehicle.y <= i.my_vehicle.y)
+                    or (j_rear_x <= i.my_vehicle.x <= j.my_vehicle.x
+                        and j_rear_y <= i.my_vehicle.y <= j.my_vehicle.y)
+                    or (i.my_vehicle.x >= j.my_vehicle.x >= i_rear_x
+                        and i.my_vehicle.y >= j.my_vehicle.y >= i_rear_y)
+                    or (i.my_vehicle.x >= j_rear_x >= i_rear_x
+                        and i.my_vehicle.y >= j_rear_y >= i_rear_y)
+                    or (i_rear_x >= j.my_vehicle.x >= i.my_vehicle.x
+                        and i_rear_y >= j.my_vehicle.y >= i.my_vehicle.y)
+                    or (j_rear_x >= i.my_vehicle.x >= j.my_vehicle.x
+                        and j_rear_y >= i.my_vehicle.y >= j.my_vehicle.y)):
+                return True
+        elif i.my_vehicle.angle % 180 == 0 and j.my_vehicle.angle % 180 == 90:
+            i_max_x = max(i.my_vehicle.x, i_rear_x)
+            i_min_x = min(i.my_vehicle.x, i_rear_x)
+            i_y = i.my_vehicle.y
+
+            j_max_y = max(j.my_vehicle.y, j_rear_y)
+            j_min_y = min(j.my_vehicle.y, j_rear_y)
+            j_x = j.my_vehicle.x
+            if (i_min_x <= j_x <= i_max_x
+            and j_min_y <= i_y <= j_max_y):
+                if trace.info:
+                    logging.info(f'crashed id loc 1={i.my_vehicle.x, i.my_vehicle.y}, loc 1 rear={i_rear_x, i_rear_y}, loc 2={j.my_vehicle.x, j.my_vehicle.y}, loc 2 rear={j_rear_x, j_rear_y}.')
+                return True
+        return False
+
     def detect_end(self, road_length):
         cleared_objects = []
         for driver in self._global_objects_list.values():
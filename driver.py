@@ -4,16 +4,17 @@ from random import randint, random
 from typing import Optional
 
 from signal import TrafficLight, Signal, TrafficLightColor
-from visuals import Visual
+from visuals import vehicle_visual
 from constants import LaneDirection, ROUNDING, SAFE_GAP_IN_SECONDS, DRIVER_COLOR, MAX_CARE_RANGE, MIN_FOLLOWING_DISTANCE, PERPENDICULAR_FOLLOWING_DISTANCE
 from utils import cal_distance, quadratic_equation, split_vector, dot, intervals_overlap
 from vehicle import Vehicle
 import sys
 from math import pow, sqrt, fabs
 from objects import GlobalObjectList
+from tracing import trace
 
 
-@dataclass
+@dataclass(slots=True)
 class Quality:
     """ Behavior """
     # how far above the speed limit the self wants to go
@@ -28,6 +29,8 @@ class Quality:
 
 
 class Driver:
+    __slots__ = ('my_vehicle', 'visibility', 'destination', 'quality', 'object_id')
+
     def __init__(self,
                  object_id: int,
                  my_vehicle: Vehicle,
@@ -41,19 +44,27 @@ class Driver:
         destination = x, y endpoint
         quality = behavior
         """
+        self.reset(object_id, my_vehicle, visibility, destination, quality)
+
+    def reset(self, object_id: int, my_vehicle: Vehicle, visibility: float, destination: tuple[float, float],
+              quality: Quality):
+        """ Set every field as a new driver, e.g. when a recycled driver is reused """
         self.my_vehicle = my_vehicle
         self.visibility = visibility
         self.destination = destination
         self.quality = quality
         self.object_id = object_id
 
-    def look(self, objects: GlobalObjectList):
+    def look(self, objects: GlobalObjectList, spatial_index=None):
+        """ Return the drivers within visibility. A SpatialGrid built from objects narrows down the candidates. """
         occupied = []
-        for driver in objects.values():
+        candidates = objects.values() if spatial_index is None else spatial_index.near(self, self.visibility)
+        for driver in candidates:
             if driver is not self:
                 closest = self.get_closest(driver)
                 min_distance = cal_distance(closest)
-                logging.debug(f"visibility: {self.object_id} to {driver.object_id}? {min_distance=} <= {self.visibility=} = {min_distance <= self.visibility}")
+                if trace.debug:
+                    logging.debug(f"visibility: {self.object_id} to {driver.object_id}? {min_distance=} <= {self.visibility=} = {min_distance <= self.visibility}")
                 if min_distance <= self.visibility:
                     occupied.append(driver)
         return occupied
@@ -129,11 +140,13 @@ class Driver:
         distance_in_direction_of_my_speed = dot(distance_x, distance_y, dx, dy)
 
         if distance_in_direction_of_my_speed <= 0:
-            logging.debug(f"{self.object_id} and {driver.object_id}: {distance_in_direction_of_my_speed=}")
+            if trace.debug:
+                logging.debug(f"{self.object_id} and {driver.object_id}: {distance_in_direction_of_my_speed=}")
             return None
 
         min_time_to_be_safe, distance_to_intercept = self._to_intercept(driver)
-        logging.debug(f"{self.object_id} and {driver.object_id}: {min_time_to_be_safe=} {distance_to_intercept=}")
+        if trace.debug:
+            logging.debug(f"{self.object_id} and {driver.object_id}: {min_time_to_be_safe=} {distance_to_intercept=}")
 
         their_new_speed = max(
             (
@@ -143,22 +156,28 @@ class Driver:
             0)
         my_current_acceleration = self.my_vehicle.acceleration
         if distance_to_intercept < safe_following_distance:
-            logging.debug(f"{self.object_id} planning to STOP because {distance_to_intercept=} < {safe_following_distance=}")
+            if trace.debug:
+                logging.debug(f"{self.object_id} planning to STOP because {distance_to_intercept=} < {safe_following_distance=}")
             return -self.my_vehicle.max_acceleration - my_current_acceleration
         elif (distance_to_intercept < SAFE_GAP_IN_SECONDS * MAX_CARE_RANGE * self.quality.following_distance * self.my_vehicle.speed) and their_new_speed > 0:
-            logging.debug(f"{self.object_id} planning to FOLLOW because {distance_to_intercept=} inside the care range")
+            if trace.debug:
+                logging.debug(f"{self.object_id} planning to FOLLOW because {distance_to_intercept=} inside the care range")
             your_final_speed = their_new_speed
         elif min_time_to_be_safe is None:
-            logging.debug(f"{self.object_id} planning to GO because no traffic ahead")
+            if trace.debug:
+                logging.debug(f"{self.object_id} planning to GO because no traffic ahead")
             return None
         elif min_time_to_be_safe > SAFE_GAP_IN_SECONDS * MAX_CARE_RANGE * self.quality.following_distance:
-            logging.debug(f"{self.object_id} planning to GO because no traffic within the care time")
+            if trace.debug:
+                logging.debug(f"{self.object_id} planning to GO because no traffic within the care time")
             return None
         elif min_time_to_be_safe <= SAFE_GAP_IN_SECONDS * self.quality.following_distance:
-            logging.debug(f"{self.object_id} planning to STOP because there's traffic within safe time range")
+            if trace.debug:
+                logging.debug(f"{self.object_id} planning to STOP because there's traffic within safe time range")
             return -self.my_vehicle.max_acceleration - my_current_acceleration
         else:
-            logging.debug(f"{self.object_id} planning to GO because nothing else to do")
+            if trace.debug:
+                logging.debug(f"{self.object_id} planning to GO because nothing else to do")
             return None  # your_final_speed = their_new_speed
 
         speed_diff = your_final_speed - self.my_vehicle.speed
@@ -167,8 +186,9 @@ class Driver:
         else:
             new_accel = speed_diff / fabs(min_time_to_be_safe or 1.0)  # always change in 1s if no time to intercept
         accel_change = new_accel - self.my_vehicle.acceleration
-        logging.debug(
-            f"{self.object_id} and {driver.object_id}: {their_new_speed=} {your_final_speed=} {new_accel=} {accel_change=}")
+        if trace.debug:
+            logging.debug(
+                f"{self.object_id} and {driver.object_id}: {their_new_speed=} {your_final_speed=} {new_accel=} {accel_change=}")
         return accel_change
 
     def _adjust_acceleration_for_traffic_light(self, lane, traffic_light):
@@ -185,31 +205,38 @@ class Driver:
         distance_in_direction_of_my_speed = dot(distance_x, distance_y, dx, dy)
 
         if distance_in_direction_of_my_speed <= 0:
-            logging.debug(f"{self.object_id} and {traffic_light}: {distance_in_direction_of_my_speed=}")
+            if trace.debug:
+                logging.debug(f"{self.object_id} and {traffic_light}: {distance_in_direction_of_my_speed=}")
             return None
 
         my_coordinate = self.my_vehicle.x * dx + self.my_vehicle.y * dy
         light_coordinate = its_x * dx + its_y * dy
 
         time_to_intercept, distance_to_intercept = self._when_vehicle_hits_a_location_in_d(my_coordinate, light_coordinate)
-        logging.debug(f"{self.object_id} and {traffic_light}: {time_to_intercept=} {distance_to_intercept=}")
+        if trace.debug:
+            logging.debug(f"{self.object_id} and {traffic_light}: {time_to_intercept=} {distance_to_intercept=}")
 
         my_current_acceleration = self.my_vehicle.acceleration
         if distance_to_intercept < self.get_safe_following_distance():
-            logging.debug(f"{self.object_id} planning to STOP because it is close to the light")
+            if trace.debug:
+                logging.debug(f"{self.object_id} planning to STOP because it is close to the light")
             return -self.my_vehicle.max_acceleration-my_current_acceleration
         elif time_to_intercept is None:
-            logging.debug(f"{self.object_id} planning to GO because no interception of light?")
+            if trace.debug:
+                logging.debug(f"{self.object_id} planning to GO because no interception of light?")
             return None
         elif time_to_intercept <= stopping_time:
             new_accel = -self.my_vehicle.speed/time_to_intercept
-            logging.debug(f"{self.object_id} planning to STOP neatly because it is getting close to the light")
+            if trace.debug:
+                logging.debug(f"{self.object_id} planning to STOP neatly because it is getting close to the light")
             return new_accel - my_current_acceleration
         elif time_to_intercept <= SAFE_GAP_IN_SECONDS * self.quality.following_distance:
-            logging.debug(f"{self.object_id} planning to STOP because getting close to a red light in time")
+            if trace.debug:
+                logging.debug(f"{self.object_id} planning to STOP because getting close to a red light in time")
             return -self.my_vehicle.max_acceleration - my_current_acceleration
         else:
-            logging.debug(f"{self.object_id} planning to GO because nothing else to do")
+            if trace.debug:
+                logging.debug(f"{self.object_id} planning to GO because nothing else to do")
             return None
 
     def _to_intercept_loc_parallel(self, loc: tuple):
@@ -280,27 +307,43 @@ class Driver:
             return None, min_distance, their_time_to_intercept_rear, their_distance_to_intercept_front
 
     def plan(self, visible_objects, road_limit, timestep_length, lane, traffic_light=Signal()):
+        """ Return the acceleration change for this timestep. visible_objects only matter if they cross my way;
+        traffic going my way is followed through lane.leader(), so lane.reorder() must have run since the vehicles
+        last moved (Simulation does this every step), or the leader may be stale.
+        """
         # the default will be trying to get to my desired acceleration
         changes = [self._get_desired_acceleration_change(road_limit, timestep_length)]
 
         light_change = self._adjust_acceleration_for_traffic_light(lane, traffic_light)
         if light_change is not None:
             changes.append(light_change)
-        for driver in visible_objects:
-            # Check if the driver is perpendicular to you
-            if self._check_whether_perpendicular(driver):
-                if not traffic_light.controls(lane):
+        # cross traffic is checked pair by pair, unless a light controls my lane
+        if not traffic_light.controls(lane):
+            for driver in visible_objects:
+                if self._check_whether_perpendicular(driver):
                     accel_change = self._adjust_acceleration_for_other_driver_perpendicular(driver)
-                else:
-                    accel_change = None
-            else:
-                accel_change = self._adjust_acceleration_for_other_driver(driver)
+                    if accel_change is not None:
+                        changes.append(accel_change)
+        # of the traffic going my way, only the driver right ahead of me in my lane matters
+        leader = self.leader_in_sight(lane)
+        if leader is not None:
+            accel_change = self._adjust_acceleration_for_other_driver(leader)
             if accel_change is not None:
                 changes.append(accel_change)
         changes = min(changes)
-        logging.debug(f'{self.object_id=} {changes=}')
+        if trace.debug:
+            logging.debug(f'{self.object_id=} {changes=}')
         return round(changes, ROUNDING)
 
+    def leader_in_sight(self, lane):
+        """ The driver right ahead of me in my lane, if it is within visibility.
+        Only correct if lane.reorder() has run since the vehicles last moved.
+        """
+        leader = lane.leader(self)
+        if leader is not None and cal_distance(self.get_closest(leader)) <= self.visibility:
+            return leader
+        return None
+
     def get_needed_angle_change(self):
         """ plan weather to turn or not """
         needed_angle_change = 0
@@ -312,7 +355,8 @@ class Driver:
 
     def _adjust_acceleration_for_other_driver_perpendicular(self, driver):
         min_time_to_be_safe, distance_to_intercept, their_time_to_leave, their_distance_to_intercept = self._to_intercept_perpendicular(driver)
-        logging.debug(f"{self.object_id} and {driver.object_id}: (perpendicular) {min_time_to_be_safe=} {distance_to_intercept=}")
+        if trace.debug:
+            logging.debug(f"{self.object_id} and {driver.object_id}: (perpendicular) {min_time_to_be_safe=} {distance_to_intercept=}")
         safe_following_distance = self.get_safe_following_distance()*PERPENDICULAR_FOLLOWING_DISTANCE
 
         my_closest_x, my_closest_y, their_closest_x, their_closest_y = self.get_closest(driver)
@@ -329,8 +373,9 @@ class Driver:
         t = their_time_to_leave + SAFE_GAP_IN_SECONDS
         new_accel = (2.0 / (t * t)) * (distance_to_intercept - self.my_vehicle.speed * t)
         accel_change = new_accel - self.my_vehicle.acceleration
-        logging.debug(
-            f"{self.object_id} and {driver.object_id}: {self.my_vehicle.speed=} time to modify speed={t} {new_accel=} {accel_change=}")
+        if trace.debug:
+            logging.debug(
+                f"{self.object_id} and {driver.object_id}: {self.my_vehicle.speed=} time to modify speed={t} {new_accel=} {accel_change=}")
 
         return accel_change
 
@@ -350,8 +395,11 @@ class Driver:
         # take your (x, y), advance it by min_time_to_impact
         # take their (x, y), advance it by min_time_to_impact
 
-    def should_plan(self):
-        return random() <= self.quality.attentiveness
+    def should_plan(self, draw: Optional[float] = None):
+        """ draw is a uniform [0, 1) number, normally one of a timestep's RandomStreams.should_plan_draws """
+        if draw is None:
+            draw = random()
+        return draw <= self.quality.attentiveness
 
     def get_max_possible_speed(self, road_max: float):
         """ returns the maximum speed a driver would be willing to go """
@@ -375,26 +423,8 @@ class Driver:
         self.my_vehicle.accelerate(change)
 
     def draw(self):
-        """Width is the width of the lane"""
-        if self.my_vehicle.angle % 180 == 90:
-            length = self.my_vehicle.width
-            width = self.my_vehicle.length
-        else:
-            length = self.my_vehicle.length
-            width = self.my_vehicle.width
-        half_length = length / 2
-        half_width = width / 2
-        top_left_x = self.my_vehicle.x + half_length
-        bottom_left_x = self.my_vehicle.x - half_length
-        top_right_x = self.my_vehicle.x + half_length
-        bottom_right_x = self.my_vehicle.x - half_length
-        top_left_y = self.my_vehicle.y - half_width
-        top_right_y = self.my_vehicle.y + half_width
-        bottom_left_y = self.my_vehicle.y - half_width
-        bottom_right_y = self.my_vehicle.y + half_width
-        return Visual(DRIVER_COLOR,
-                      [(top_left_x, top_left_y), (top_right_x, top_right_y), (bottom_right_x, bottom_right_y),
-                       (bottom_left_x, bottom_left_y)])
+        vehicle = self.my_vehicle
+        return vehicle_visual(DRIVER_COLOR, vehicle.x, vehicle.y, vehicle.length, vehicle.width, vehicle.angle)
 
     def __repr__(self):
         return f"Driver: object_id={self.object_id} destination={self.destination} visibility={self.visibility} quality={self.quality} vehicle={self.my_vehicle}"
@@ -1,13 +1,20 @@
+import heapq
 import logging
 
 from utils import cal_distance
 from vehicle import Vehicle, Car, Motorcycle, Truck, Pedestrian, Bicycle
-from random import randint, choices, gauss, random, choice
+from state_store import StoredVehicle
 from driver import Quality, Driver
 from objects import GlobalObjectList
 from settings import Settings
 from enum import Enum
-from numpy.random import poisson
+import numpy as np
+from tracing import trace
+
+# vehicles' worth of arrival gaps, vehicle types and driver qualities drawn from the random stream at a time
+SAMPLE_BLOCK = 256
+# in the order of the weights in Generator._vehicle_type_weights
+VEHICLE_TYPES = (Car, Truck, Motorcycle, Bicycle, Pedestrian)
 
 
 class LaneDirection(Enum):
@@ -18,57 +25,110 @@ class LaneDirection(Enum):
 
 class Generator:
 
-    def __init__(self, objects: GlobalObjectList, settings: Settings, flow_direction: LaneDirection, angle: float = 0):
+    def __init__(self, objects: GlobalObjectList, settings: Settings, flow_direction: LaneDirection, angle: float = 0,
+                 rng: np.random.Generator = None):
+        """ rng is this generator's own random stream (see RandomStreams.lane_stream); an unseeded one if None """
         self.objects = objects  # global objects list
         self.settings = settings  # generator settings
         self.flow_direction = flow_direction
         self.angle = angle
+        self.rng = rng if rng is not None else np.random.default_rng()
 
         self._flow = self.settings["flow"]
-        self._next_generation_time = poisson(self._flow)
+        self._type_weights = self._vehicle_type_weights()
+        self._clear_samples()
+        self._next_generation_time = self._next_gap()
         self._next_id = 0
         self.__last_generation = None
 
+    def update_settings(self, settings: Settings):
+        """ Use new generator settings from the next vehicle on. The arrival already scheduled stays. """
+        old_settings, self.settings = self.settings, settings
+        self._flow = self.settings["flow"]
+        self._type_weights = self._vehicle_type_weights()
+        # samples drawn for the old settings are dropped; unchanged settings keep theirs, so the run goes on the same
+        if settings["flow"] != old_settings["flow"]:
+            self._arrival_gaps = []
+        if settings['vehicle_distribution'] != old_settings['vehicle_distribution']:
+            self._vehicle_types = []
+        if settings['attentiveness'] != old_settings['attentiveness']:
+            self._qualities = []
+
+    def reseed(self, rng: np.random.Generator):
+        """ Draw from a new random stream, dropping every sample taken from the old one """
+        self.rng = rng
+        self._clear_samples()
+
+    def _clear_samples(self):
+        # random draws made SAMPLE_BLOCK vehicles at a time and popped one by one
+        self._arrival_gaps: list[int] = []
+        self._vehicle_types: list[int] = []
+        self._qualities: list[tuple[float, float, float]] = []
+
+    def _next_gap(self) -> int:
+        """ The time from one arrival to the next """
+        if not self._arrival_gaps:
+            self._arrival_gaps = self.rng.poisson(self._flow, SAMPLE_BLOCK).tolist()
+        return self._arrival_gaps.pop()
+
+    def _next_quality(self) -> tuple[float, float, float]:
+        """ The attentiveness, speeding and following distance of the next driver """
+        if not self._qualities:
+            rng = self.rng
+            attentiveness = np.clip(rng.normal(self.settings['attentiveness']['average'],
+                                               self.settings['attentiveness']['width'], SAMPLE_BLOCK), 0.1, 1.0)
+            speeding = np.clip(rng.normal(1, 0.2, SAMPLE_BLOCK), 0.75, 1.25)
+            following_distance = np.clip(rng.normal(1.0, 0.15, SAMPLE_BLOCK), 0.6, 1.4)
+            self._qualities = list(zip(attentiveness.tolist(), speeding.tolist(), following_distance.tolist()))
+        return self._qualities.pop()
+
+    def _vehicle_type_weights(self) -> np.ndarray:
+        settings = self.settings['vehicle_distribution']
+        weights = np.array([settings.get('car', 0.0), settings.get('truck', 0.0), settings.get('motorcycle', 0.0),
+                            settings.get('bike', 0.0), settings.get('pedestrian', 0.0)])
+        return weights / weights.sum()
+
+    @property
+    def next_generation_time(self):
+        """ The time of the next scheduled arrival. It only moves forward when should_generate returns True. """
+        return self._next_generation_time
+
     # TODO: HINT: WRITE TESTS FOR THIS FUNCTION
     def should_generate(self, timestep, lane) -> bool:
-        """ Return True if a vehicle should be generated this timestep """
-        x, y = lane.get_position(0)
-        endx, endy = lane.get_position(1)
-        if self.__last_generation not in self.objects.values():
-            objects_in_lane = lane.get_objects()
-            if not objects_in_lane:
-                self.__last_generation = None
-            else:
-                self.__last_generation = objects_in_lane[-1]
-        if self._next_generation_time <= timestep:
-            if self.__last_generation is not None:
-                rear_x, rear_y = self.__last_generation.my_vehicle.get_rear()
-                distance = cal_distance((x, y, rear_x, rear_y))
-                safe_following_distance = self.__last_generation.get_safe_following_distance()
-                if (distance <= safe_following_distance
-                    or not (x <= rear_x <= endx)  # rear has not yet passed beginning of road
-                    or not (y <= rear_y <= endy)
-                ):
+        """ Return True if a vehicle should be generated this timestep.
+        The spawn gap is checked against the lane's tail, the vehicle most recently added to it.
+        """
+        if self._next_generation_time > timestep:
+            if trace.debug:
+                logging.debug(f"generator will not generate at {timestep}. waiting for {self._next_generation_time=}")
+            return False
+        self.__last_generation = lane.tail()
+        if self.__last_generation is not None:
+            x, y = lane.get_position(0)
+            endx, endy = lane.get_position(1)
+            rear_x, rear_y = self.__last_generation.my_vehicle.get_rear()
+            distance = cal_distance((x, y, rear_x, rear_y))
+            safe_following_distance = self.__last_generation.get_safe_following_distance()
+            if (distance <= safe_following_distance
+                or not (x <= rear_x <= endx)  # rear has not yet passed beginning of road
+                or not (y <= rear_y <= endy)
+            ):
+                if trace.debug:
                     logging.debug(f"generator will not generate because: {distance} <= {safe_following_distance=} or {not (x < rear_x < endx)=} or {not (y < rear_y < endy)=}")
-                    return False
-            new_next_generation_time = poisson(self._flow)
-            self._next_generation_time += new_next_generation_time
+                return False
+        self._next_generation_time += self._next_gap()
+        if trace.debug:
             logging.debug(f"generator will generate at {timestep}. {self._next_generation_time=}")
-            return True
-        else:
-            logging.debug(f"generator will not generate at {timestep}. waiting for {self._next_generation_time=}")
-            return False
+        return True
 
     def pick_vehicle_type(self):
         """ Pick a Vehicle's type """
-        settings = self.settings['vehicle_distribution']
-        the_type = choices([Car, Truck, Motorcycle, Bicycle, Pedestrian],
-                           [settings.get('car', 0.0), settings.get('truck', 0.0), settings.get('motorcycle', 0.0),
-                            settings.get('bike', 0.0), settings.get('pedestrian', 0.0)])
-        return the_type[0]
+        if not self._vehicle_types:
+            self._vehicle_types = self.rng.choice(len(VEHICLE_TYPES), SAMPLE_BLOCK, p=self._type_weights).tolist()
+        return VEHICLE_TYPES[self._vehicle_types.pop()]
 
-    def generate_vehicle(self, x, y, driver_max, road_max, speeding, settings):
-        """ pick parameters + type of vehicle and turn them into a Vehicle object """
+    def generate_vehicle(self, x, y, driver_max, road_max, speeding, settings, vehicle: Vehicle = None):
+        """ pick parameters + type of vehicle and turn them into a Vehicle object, or reset a recycled vehicle """
         my_type = self.pick_vehicle_type()
         vehicle_settings = my_type.get_settings(settings)
         length = vehicle_settings['length']
@@ -79,42 +139,76 @@ class Generator:
             speed = Driver.calc_max_possible_speed(vehicle_settings['max_speed'], road_max, speeding)
             acceleration = 0
         width = vehicle_settings['width']
-        self.__last_generation = Vehicle(x=x, y=y,
-                       length=length,
-                       speed=speed,
-                       acceleration=acceleration,
-                       max_speed=vehicle_settings['max_speed'],
-                       max_acceleration=vehicle_settings['max_acceleration'],
-                       max_angle=vehicle_settings['max_angle'],
-                       angle=self.angle,
-                       width=width)
+        vehicle_kwargs = dict(x=x, y=y,
+                              length=length,
+                              speed=speed,
+                              acceleration=acceleration,
+                              max_speed=vehicle_settings['max_speed'],
+                              max_acceleration=vehicle_settings['max_acceleration'],
+                              max_angle=vehicle_settings['max_angle'],
+                              angle=self.angle,
+                              width=width)
+        store = self.objects.get_state_store()
+        if vehicle is not None:
+            vehicle.reset(**vehicle_kwargs)
+            self.__last_generation = vehicle
+        elif store is not None:
+            self.__last_generation = StoredVehicle(store, **vehicle_kwargs)
+        else:
+            self.__last_generation = Vehicle(**vehicle_kwargs)
         return self.__last_generation
 
     def init_following_distance(self):
-        self.following_distance = randint(2, 7)
+        self.following_distance = int(self.rng.integers(2, 7, endpoint=True))
         if self.following_distance == 7:
-            self.following_distance = randint(7, 10)
+            self.following_distance = int(self.rng.integers(7, 10, endpoint=True))
         return self.following_distance
 
     def generate(self, x0: float, y0: float, visibility: float, endx: float, endy: float, road_max, settings):
         """ Generate a new vehicle and driver at (x0, y0) pointing in the given direction.
         Return the newly generated object
         """
-        attentiveness = gauss(self.settings['attentiveness']['average'], self.settings['attentiveness']['width'])
-        attentiveness = min(attentiveness, 1.0)
-        attentiveness = max(attentiveness, 0.1)
-
-        speeding = gauss(1, 0.2)
-        speeding = min(speeding, 1.25)
-        speeding = max(0.75, speeding)
-
-        following_distance = gauss(1.0, 0.15)
-        following_distance = min(following_distance, 1.4)
-        following_distance = max(following_distance, 0.6)
-
-        quality = Quality(speeding=speeding, following_distance=following_distance, attentiveness=attentiveness)
-        driver = Driver(self.objects.get_next_id(),
-                        self.generate_vehicle(x0, y0, road_max + speeding, road_max, speeding, settings), visibility,
-                        (endx, endy), quality)
+        attentiveness, speeding, following_distance = self._next_quality()
+        driver = self.objects.reuse_driver()
+        if driver is None:
+            quality = Quality(speeding=speeding, following_distance=following_distance, attentiveness=attentiveness)
+            driver = Driver(self.objects.get_next_id(),
+                            self.generate_vehicle(x0, y0, road_max + speeding, road_max, speeding, settings),
+                            visibility, (endx, endy), quality)
+        else:
+            quality = driver.quality
+            quality.speeding, quality.following_distance, quality.attentiveness = \
+                speeding, following_distance, attentiveness
+            driver.reset(self.objects.get_next_id(),
+                         self.generate_vehicle(x0, y0, road_max + speeding, road_max, speeding, settings,
+                                               driver.my_vehicle),
+                         visibility, (endx, endy), quality)
         self.__last_generation = driver
         return driver
+
+
+class ArrivalScheduler:
+    """ The lanes in a heap keyed on their generators' next arrival time, so a step only touches the lanes that
+    have an arrival due. Take the due lanes with due(), try to generate in each, then put every one of them back
+    with schedule(); a lane whose spawn gap was blocked keeps its time and is due again the next step.
+    """
+
+    def __init__(self, lanes: list):
+        self.lanes = lanes
+        self._lane_index = {lane: index for index, lane in enumerate(lanes)}
+        self._heap = [(lane.generator.next_generation_time, index) for index, lane in enumerate(lanes)]
+        heapq.heapify(self._heap)
+
+    def due(self, the_time) -> list:
+        """ Remove and return the lanes with an arrival at or before the_time, in lane order """
+        heap = self._heap
+        indices = []
+        while heap and heap[0][0] <= the_time:
+            indices.append(heapq.heappop(heap)[1])
+        # lane order, so object ids are handed out the same way as when every lane is polled
+        indices.sort()
+        return [self.lanes[index] for index in indices]
+
+    def schedule(self, lane):
+        """ Put a lane back at its generator's next arrival time """
+        heapq.heappush(self._heap, (lane.generator.next_generation_time, self._lane_index[lane]))
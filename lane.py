@@ -12,12 +12,28 @@ from visuals import Visual
 from signal import TrafficLight, StopSign
 from typing import Optional
 import logging
+from tracing import trace
 
 
 class SanityError(Exception):
     pass
 
 
+@dataclass(frozen=True)
+class LaneGeometry:
+    """ Static geometry of a lane, computed once from its road and the other lanes on that road """
+    start: tuple[float, float]
+    end: tuple[float, float]
+    # signed distance of the lane's centerline from the road's axis
+    center_offset: float
+    min_x: float
+    max_x: float
+    min_y: float
+    max_y: float
+    # unit vector pointing from start to end
+    heading: tuple[float, float]
+
+
 class Lane:
     def __init__(self,
                  lane_num: int,
@@ -36,14 +52,22 @@ class Lane:
         self.generator = generator
         self.direction = flow_direction
         self.lane_num = lane_num
-        # a list of object identifiers
-        self.objects_in_lane = objects_in_lane or []
+        self._geometry: Optional[LaneGeometry] = None
+        # the object identifiers in this lane, in the order they were added.
+        # A dict is used as an ordered set so membership and removal are constant time.
+        self.objects_in_lane: dict[int, None] = {}
+        # the drivers front to back along the lane as of the last reorder(), and each one's index in that list
+        self._ordered: list = []
+        self._rank: dict[int, int] = {}
         self.traffic_light = traffic_light
+        for driver_id in objects_in_lane or []:
+            self.add(driver_id)
 
     def add(self, driver_id: int):
         """ add an object from the global objects list """
         if driver_id not in self.objects_in_lane:
-            self.objects_in_lane.append(driver_id)
+            self.objects_in_lane[driver_id] = None
+            self.objects.assign_lane(driver_id, self)
         else:
             raise ValueError(f"Adding {driver_id} to this lane twice")
         return self
@@ -57,12 +81,18 @@ class Lane:
     def get_speed_limit(self):
         return self.road.get_speed_limit()
 
-    def get_position(self, fraction: float):
-        """ Return the position of this lane a fraction of a length down the road
-         0 = beginning, 1 = end
-        """
-        road_length = self.road.get_length()
-        x = road_length * fraction - road_length / 2
+    @property
+    def geometry(self) -> LaneGeometry:
+        """ The cached lane geometry. It is rebuilt after invalidate_geometry(). """
+        if self._geometry is None:
+            self._geometry = self._build_geometry()
+        return self._geometry
+
+    def invalidate_geometry(self):
+        """ Forget the cached geometry, e.g. because a lane was added to this road """
+        self._geometry = None
+
+    def _build_geometry(self) -> LaneGeometry:
         lanes = self.objects.get_lanes_by_road(self.road)
         road_width = 0
         my_center = 0
@@ -73,7 +103,20 @@ class Lane:
                 my_center += lane.width
 
         my_center += self.width / 2
-        y = my_center - road_width / 2
+        center_offset = my_center - road_width / 2
+        start = self._position(0.0, center_offset)
+        end = self._position(1.0, center_offset)
+        length = self.road.get_length()
+        heading = ((end[0] - start[0]) / length, (end[1] - start[1]) / length) if length else (0.0, 0.0)
+        return LaneGeometry(start=start, end=end, center_offset=center_offset,
+                            min_x=min(start[0], end[0]), max_x=max(start[0], end[0]),
+                            min_y=min(start[1], end[1]), max_y=max(start[1], end[1]),
+                            heading=heading)
+
+    def _position(self, fraction: float, center_offset: float):
+        road_length = self.road.get_length()
+        x = road_length * fraction - road_length / 2
+        y = center_offset
         if self.direction == LaneDirection.BACKWARD:
             y = -y
             x = -x
@@ -84,10 +127,58 @@ class Lane:
         else:
             raise SanityError('BETA version, remember?')
 
+    def get_position(self, fraction: float):
+        """ Return the position of this lane a fraction of a length down the road
+         0 = beginning, 1 = end
+        """
+        geometry = self.geometry
+        if fraction == 0:
+            return geometry.start
+        if fraction == 1:
+            return geometry.end
+        return self._position(fraction, geometry.center_offset)
+
     def get_objects(self) -> list:
         """ return a list of objects in the lane """
         return list(self)
 
+    def __contains__(self, driver) -> bool:
+        return driver.object_id in self.objects_in_lane and self.objects.get(driver.object_id) is driver
+
+    def tail(self):
+        """ return the object most recently added to the lane, or None if the lane is empty """
+        if not self.objects_in_lane:
+            return None
+        return self.objects[next(reversed(self.objects_in_lane))]
+
+    def reorder(self):
+        """ Sort the drivers front to back along the lane, for leader() and follower(). Call it after they move.
+        Vehicles enter at the back and rarely pass each other, so the insertion order is nearly sorted already and
+        the sort is close to linear.
+        """
+        heading_x, heading_y = self.geometry.heading
+
+        def position(driver):
+            vehicle = driver.my_vehicle
+            return vehicle.x * heading_x + vehicle.y * heading_y
+
+        self._ordered = sorted(self, key=position, reverse=True)
+        self._rank = {driver.object_id: index for index, driver in enumerate(self._ordered)}
+
+    def leader(self, driver):
+        """ The driver right ahead of driver in this lane as of the last reorder(), or None """
+        index = self._rank.get(driver.object_id)
+        if not index:
+            return None
+        return self._ordered[index - 1]
+
+    def follower(self, driver):
+        """ The driver right behind driver in this lane as of the last reorder(), or None """
+        index = self._rank.get(driver.object_id)
+        if index is None or index + 1 >= len(self._ordered):
+            return None
+        return self._ordered[index + 1]
+
     def __iter__(self) -> driver.Driver:
         for obj in self.objects_in_lane:
             yield self.objects[obj]
@@ -95,24 +186,27 @@ class Lane:
     def remove(self, obj: int):
         """ removes the given object id from the lane """
         if obj in self.objects_in_lane:
-            self.objects_in_lane.remove(obj)
+            del self.objects_in_lane[obj]
+            self.objects.unassign_lane(obj)
         return self
 
     def detect_end(self) -> list[int]:
-        begin_x, begin_y = self.get_position(0.0)
-        end_x, end_y = self.get_position(1.0)
+        geometry = self.geometry
+        begin_x, begin_y = geometry.start
+        end_x, end_y = geometry.end
         finished = []
 
-        max_x = max(begin_x, end_x)
-        max_y = max(begin_y, end_y)
-        min_x = min(begin_x, end_x)
-        min_y = min(begin_y, end_y)
+        max_x = geometry.max_x
+        max_y = geometry.max_y
+        min_x = geometry.min_x
+        min_y = geometry.min_y
 
         for obj_id in self.objects_in_lane:
             obj = self.objects[obj_id]
             x = obj.my_vehicle.x
             y = obj.my_vehicle.y
-            logging.debug(f"{x=} {y=} {begin_x=} {end_x=} {begin_y=} {end_y=}")
+            if trace.debug:
+                logging.debug(f"{x=} {y=} {begin_x=} {end_x=} {begin_y=} {end_y=}")
 
             #length = self.road.get_length()
             if (x > max_x
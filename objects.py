@@ -1,7 +1,6 @@
 from typing import Optional
 
 from constants import WINDOW_WIDTH, WINDOW_HEIGHT, LINE_WIDTH, ROAD_COLOR, Ratio
-import pygame
 from road import Road
 import time
 from visuals import Visual
@@ -13,11 +12,20 @@ class GlobalObjectList(dict):
     key is the unique identifier
     value is an object (driver, obstacle)
     """
-    _next_id: int = 0
-    _roads: list = []
-    _lanes: list = []
-    _max_length: float = 0.0
-    _traffic_light: Signal = Signal()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # everything lives on the instance, so several worlds can share one process
+        self._next_id: int = 0
+        self._roads: list = []
+        self._lanes: list = []
+        self._max_length: float = 0.0
+        self._traffic_light: Signal = Signal()
+        self._state_store = None
+        # object id -> the lane it is in, maintained by Lane.add and Lane.remove
+        self._lane_by_object = {}
+        # drivers that left the world, with their vehicles, kept for Generator.generate to reset and reuse
+        self._recycled: list = []
 
     def coord_to_pixels(self, x, y):
         ''' Returns pixels/meter '''
@@ -44,6 +52,9 @@ class GlobalObjectList(dict):
 
     def add_lane(self, lane):
         self._lanes.append(lane)
+        # lane positions depend on every lane of the road
+        for other in self.get_lanes_by_road(lane.road):
+            other.invalidate_geometry()
 
     def get_lanes(self) -> list:
         return self._lanes
@@ -54,6 +65,16 @@ class GlobalObjectList(dict):
                 return lane
         return None
 
+    def assign_lane(self, object_id, lane):
+        self._lane_by_object[object_id] = lane
+
+    def unassign_lane(self, object_id):
+        self._lane_by_object.pop(object_id, None)
+
+    def get_lane_of(self, object_id):
+        """ Return the lane an object is in, or None """
+        return self._lane_by_object.get(object_id)
+
     def get_lanes_by_road(self, road) -> list:
         return [lane for lane in self._lanes if lane.road is road]
 
@@ -66,19 +87,37 @@ class GlobalObjectList(dict):
     def add_light(self, light):
         self._traffic_light = light
 
+    def get_state_store(self):
+        """ The VehicleStateStore new vehicles live in, or None for plain per-object vehicles """
+        return self._state_store
+
+    def set_state_store(self, store):
+        self._state_store = store
+
+    def recycle(self, driver):
+        """ Keep a driver that left the world for reuse. Nothing else may hold on to it. """
+        driver.my_vehicle.release(keep_state=False)
+        self._recycled.append(driver)
+
+    def reuse_driver(self):
+        """ Return a recycled driver to reset, or None """
+        return self._recycled.pop() if self._recycled else None
+
     def draw(self):
         all_visuals = []
-        all_visuals_pixels = []
         for road in self._roads:
             all_visuals += road.draw(self)
         for lane in self._lanes:
             all_visuals += lane.draw()
-            for driver in self.values():
-                if driver.object_id in lane.objects_in_lane:
-                    all_visuals.append(driver.draw())
+            for driver in lane:
+                all_visuals.append(driver.draw())
         all_visuals += self._traffic_light.draw()
+        return self.to_pixels(all_visuals)
 
-        for obj in all_visuals:
+    def to_pixels(self, visuals: list) -> list:
+        """ Convert visuals in world coordinates to window pixels """
+        all_visuals_pixels = []
+        for obj in visuals:
             newlocs = [self.coord_to_pixels(*loc) for loc in obj.locations]
             all_visuals_pixels.append(Visual(obj.color, newlocs))
         return all_visuals_pixels
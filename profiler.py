@@ -0,0 +1,109 @@
+""" Timing of the phases of the step loop.
+
+    with profiler.phase('planning'):
+        ...
+    profiler.count('plan_pairs', len(visible_objects))
+
+StepProfiler keeps the duration of every phase in every step (8 bytes each) for percentiles, plus named counters.
+NO_PROFILER has the same interface and does nothing, so the step loop does not check whether profiling is on.
+"""
+import cProfile
+import json
+import time
+from array import array
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+
+class NullProfiler:
+    enabled = False
+    _context = nullcontext()
+
+    def phase(self, name: str):
+        return self._context
+
+    def count(self, name: str, amount: int = 1):
+        pass
+
+    def close(self):
+        pass
+
+
+NO_PROFILER = NullProfiler()
+
+
+class StepProfiler:
+    """ Per-phase monotonic timings and counters for a run, and optionally a cProfile of the whole run """
+    enabled = True
+
+    def __init__(self, cprofile_file: str = None):
+        # phase -> seconds it took in every step, in the order the phases first ran
+        self.samples: dict[str, array] = {}
+        self.counters: dict[str, int] = {}
+        self.cprofile_file = cprofile_file
+        self._cprofile = None
+        if cprofile_file:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = array('d')
+            samples.append(elapsed)
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self) -> dict:
+        """ Total, mean, percentiles and share of the time of every phase, and the counters """
+        total = sum(sum(samples) for samples in self.samples.values())
+        phases = {}
+        for name, samples in self.samples.items():
+            seconds = np.frombuffer(samples, dtype=np.float64)
+            p50, p90, p99 = np.percentile(seconds, [50, 90, 99])
+            phases[name] = {'calls': len(seconds),
+                            'total': float(seconds.sum()),
+                            'mean': float(seconds.mean()),
+                            'p50': float(p50),
+                            'p90': float(p90),
+                            'p99': float(p99),
+                            'max': float(seconds.max()),
+                            'share': float(seconds.sum() / total) if total else 0.0}
+        return {'phases': phases, 'counters': dict(self.counters)}
+
+    def format(self) -> str:
+        summary = self.summary()
+        lines = [f"{'phase':>16} {'total s':>9} {'share':>6} {'mean ms':>9} {'p50 ms':>8} {'p90 ms':>8} "
+                 f"{'p99 ms':>8} {'max ms':>8}"]
+        for name, stats in summary['phases'].items():
+            lines.append(f"{name:>16} {stats['total']:>9.3f} {stats['share']:>6.1%} {stats['mean'] * 1000:>9.3f} "
+                         f"{stats['p50'] * 1000:>8.3f} {stats['p90'] * 1000:>8.3f} {stats['p99'] * 1000:>8.3f} "
+                         f"{stats['max'] * 1000:>8.3f}")
+        for name, value in summary['counters'].items():
+            lines.append(f'{name}: {value}')
+        return '\n'.join(lines)
+
+    def save(self, file_name: str):
+        with open(file_name, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def close(self):
+        """ Stop the cProfile, if there is one, and save its statistics """
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_file)
+            self._cprofile = None
+
+    def __getstate__(self):
+        """ Everything but the cProfile, which cannot be pickled; a checkpoint restores the timings only """
+        state = self.__dict__.copy()
+        state['_cprofile'] = None
+        return state
@@ -0,0 +1,32 @@
+from typing import Union
+
+import numpy as np
+
+
+class RandomStreams:
+    """ The random number streams of one run, all derived from one root seed with NumPy's SeedSequence.
+    Every lane generator gets its own stream, and the drivers' attentiveness coin flips come from one more,
+    so adding a lane or a driver does not shift the numbers any other part of the run sees.
+    """
+
+    def __init__(self, seed: Union[int, np.random.SeedSequence, None] = None):
+        """ seed is an int, a SeedSequence (e.g. one per replication), or None for fresh entropy """
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        self._lanes, attentiveness = self.seed_sequence.spawn(2)
+        self.attentiveness = np.random.default_rng(attentiveness)
+
+    def lane_stream(self) -> np.random.Generator:
+        """ Return an independent stream for the next lane. Lanes must ask in the same order on every run. """
+        return np.random.default_rng(self._lanes.spawn(1)[0])
+
+    def should_plan_draws(self, count: int) -> np.ndarray:
+        """ One uniform [0, 1) draw per driver for this timestep's Driver.should_plan checks """
+        return self.attentiveness.random(count)
+
+
+def replication_seed(seed: int, replication: int) -> np.random.SeedSequence:
+    """ The seed of one replication: statistically independent of every other replication of the same root seed """
+    return np.random.SeedSequence(seed, spawn_key=(replication,))
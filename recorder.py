@@ -0,0 +1,136 @@
+""" Per-step vehicle trajectories in columnar files.
+
+A recording is a directory with one raw little-endian file per column (<column>.bin) and meta.json, which holds
+the column types and the number of rows. Rows are appended step by step, so the step column is sorted.
+load_trajectories memory-maps the columns, so traces larger than RAM can be sliced and searched.
+"""
+import json
+import os
+
+import numpy as np
+
+# column name -> dtype of the stored values
+COLUMNS = {
+    'step': np.dtype('<u4'),
+    'object_id': np.dtype('<u4'),
+    'x': np.dtype('<f8'),
+    'y': np.dtype('<f8'),
+    'speed': np.dtype('<f8'),
+    'acceleration': np.dtype('<f8'),
+    'angle': np.dtype('<f8'),
+    # index of the lane in GlobalObjectList.get_lanes(), -1 for none
+    'lane': np.dtype('<i2'),
+    'length': np.dtype('<f8'),
+    'width': np.dtype('<f8'),
+}
+# the columns read straight off the vehicles
+_VEHICLE_COLUMNS = ('x', 'y', 'speed', 'acceleration', 'angle', 'length', 'width')
+META_FILE = 'meta.json'
+
+
+class TrajectoryRecorder:
+    """ Appends the state of every vehicle in a world to preallocated column buffers once per step.
+    A full buffer is flushed to the column files. Files are only open while flushing, so a Simulation holding a
+    recorder can be checkpointed; a resumed run cuts the files back to the rows flushed at the checkpoint.
+    """
+
+    def __init__(self, directory: str, world, chunk_rows: int = 1 << 16):
+        self.directory = directory
+        self.world = world
+        self.chunk_rows = chunk_rows
+        self._lane_index = {lane: index for index, lane in enumerate(world.get_lanes())}
+        self._buffers = {name: np.empty(chunk_rows, dtype) for name, dtype in COLUMNS.items()}
+        self._filled = 0
+        self.rows_flushed = 0
+        os.makedirs(directory, exist_ok=True)
+        self._flush()
+
+    @property
+    def rows(self) -> int:
+        return self.rows_flushed + self._filled
+
+    def record(self, step: int):
+        """ Append one row per vehicle in the world """
+        drivers = list(self.world.values())
+        count = len(drivers)
+        if not count:
+            return
+        if self._filled + count > self.chunk_rows:
+            self._flush()
+            if count > self.chunk_rows:
+                self._resize(count)
+        start, end = self._filled, self._filled + count
+        buffers = self._buffers
+        buffers['step'][start:end] = step
+        buffers['object_id'][start:end] = np.fromiter((driver.object_id for driver in drivers), np.uint32, count)
+        store = self.world.get_state_store()
+        if store is not None:
+            # the vehicles' state is already in columns, so gather it by slot
+            slots = np.fromiter((driver.my_vehicle._slot for driver in drivers), np.intp, count)
+            for name in _VEHICLE_COLUMNS:
+                buffers[name][start:end] = getattr(store, name)[slots]
+        else:
+            vehicles = [driver.my_vehicle for driver in drivers]
+            for name in _VEHICLE_COLUMNS:
+                buffers[name][start:end] = np.fromiter((getattr(vehicle, name) for vehicle in vehicles),
+                                                       np.float64, count)
+        lane_of = self.world.get_lane_of
+        lane_index = self._lane_index
+        buffers['lane'][start:end] = np.fromiter(
+            (lane_index.get(lane_of(driver.object_id), -1) for driver in drivers), np.int16, count)
+        self._filled = end
+
+    def __getstate__(self):
+        """ Only the rows in use, so checkpoints do not carry a whole empty chunk """
+        state = self.__dict__.copy()
+        state['_buffers'] = {name: buffer[:self._filled].copy() for name, buffer in self._buffers.items()}
+        return state
+
+    def __setstate__(self, state):
+        filled = state.pop('_buffers')
+        self.__dict__.update(state)
+        self._resize(self.chunk_rows)
+        for name, rows in filled.items():
+            self._buffers[name][:len(rows)] = rows
+
+    def _resize(self, chunk_rows: int):
+        self.chunk_rows = chunk_rows
+        self._buffers = {name: np.empty(chunk_rows, dtype) for name, dtype in COLUMNS.items()}
+
+    def _flush(self):
+        """ Write the buffered rows after the rows already flushed, dropping anything a dead run wrote past them """
+        for name, dtype in COLUMNS.items():
+            file_name = os.path.join(self.directory, f'{name}.bin')
+            with open(file_name, 'r+b' if os.path.exists(file_name) else 'wb') as f:
+                f.seek(self.rows_flushed * dtype.itemsize)
+                f.truncate()
+                f.write(self._buffers[name][:self._filled].tobytes())
+        self.rows_flushed += self._filled
+        self._filled = 0
+        meta = {'rows': self.rows_flushed, 'columns': {name: dtype.str for name, dtype in COLUMNS.items()}}
+        with open(os.path.join(self.directory, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+    def close(self):
+        self._flush()
+
+
+def load_trajectories(directory: str) -> dict[str, np.memmap]:
+    """ Memory-map every column of a recording. Nothing is read until the arrays are used. """
+    with open(os.path.join(directory, META_FILE)) as f:
+        meta = json.load(f)
+    rows = meta['rows']
+    columns = {}
+    for name, dtype in meta['columns'].items():
+        if rows:
+            columns[name] = np.memmap(os.path.join(directory, f'{name}.bin'), np.dtype(dtype), mode='r',
+                                      shape=(rows,))
+        else:
+            columns[name] = np.empty(0, np.dtype(dtype))
+    return columns
+
+
+def step_rows(columns: dict, step: int) -> slice:
+    """ The rows of one step, found by binary search on the sorted step column """
+    steps = columns['step']
+    return slice(int(np.searchsorted(steps, step, 'left')), int(np.searchsorted(steps, step, 'right')))
@@ -0,0 +1,44 @@
+""" pygame rendering plugin. Only imported when a run is not headless. """
+import pygame
+import constants
+
+pygame.init()
+
+
+class Window:
+    def __init__(self, global_objects_list):
+        self.global_objects_list = global_objects_list
+        self.screen = pygame.display.set_mode((constants.WINDOW_WIDTH, constants.WINDOW_HEIGHT))
+        self.clock = pygame.time.Clock()
+        # number of visuals drawn by the last show()
+        self.objects_drawn = 0
+
+    def update(self, the_time):
+        return self.show(self.global_objects_list.draw())
+
+    def show(self, obj_visuals, on_key=None):
+        """ Draw visuals that are already in pixels. on_key(key) is called for every key pressed.
+        Return False once the window is closed.
+        """
+        self.screen.fill(constants.BACKGROUND)
+        self.objects_drawn = len(obj_visuals)
+        for obj in obj_visuals:
+            pygame.draw.polygon(self.screen, obj.color,
+                                obj.locations)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+            if event.type == pygame.KEYDOWN and on_key is not None:
+                on_key(event.key)
+        pygame.display.flip()
+        self.clock.tick(60)
+        return True
+
+
+'''if __name__ == "__main__":
+    w = Window()
+    running = True
+    while running:
+        time.sleep(0.02)
+        running = w.update(0)
+    pygame.quit()'''
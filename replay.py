@@ -0,0 +1,114 @@
+""" Watch a recorded run (see recorder.py) without simulating it again.
+
+To run: replay settings_file trajectory_directory [--speed 2] [--start 500]
+
+The settings file must be the one the run was made with; it supplies the roads, lanes and traffic light.
+Keys: space pauses, left/right seek 10 seconds, up/down double or halve the speed, home goes back to the start.
+"""
+import argparse
+import time
+
+from constants import DRIVER_COLOR
+from recorder import load_trajectories, step_rows
+from settings import Settings
+from simulation import build_world
+from visuals import vehicle_visual
+
+SEEK_SECONDS = 10
+
+
+class Replay:
+    """ The frames of a recording. The vehicles come from the memory-mapped columns, the roads and lanes from the
+    settings, and the traffic light is stepped forward to the frame's time.
+    """
+
+    def __init__(self, my_settings, directory: str):
+        self.settings = my_settings
+        self.columns = load_trajectories(directory)
+        self.timestep_length = my_settings['timestep']
+        steps = self.columns['step']
+        self.first_step = int(steps[0]) if len(steps) else 0
+        self.last_step = int(steps[-1]) if len(steps) else 0
+        self._reset_world()
+
+    def _reset_world(self):
+        self.world = build_world(self.settings)
+        # the last step the traffic light was updated for
+        self._light_step = -1
+
+    def _advance_light(self, step: int):
+        if step < self._light_step:
+            self._reset_world()
+        light = self.world.get_light()
+        for light_step in range(self._light_step + 1, step + 1):
+            light.update(light_step * self.timestep_length)
+        self._light_step = max(step, self._light_step)
+
+    def vehicles(self, step: int) -> list:
+        """ The vehicles of a step, in world coordinates """
+        rows = step_rows(self.columns, step)
+        columns = self.columns
+        x, y = columns['x'][rows], columns['y'][rows]
+        length, width, angle = columns['length'][rows], columns['width'][rows], columns['angle'][rows]
+        return [vehicle_visual(DRIVER_COLOR, float(x[i]), float(y[i]), float(length[i]), float(width[i]),
+                               float(angle[i]))
+                for i in range(len(x))]
+
+    def frame(self, step: int) -> list:
+        """ Everything drawn for a step, in window pixels """
+        step = min(max(step, self.first_step), self.last_step)
+        self._advance_light(step)
+        world = self.world
+        return world.draw() + world.to_pixels(self.vehicles(step))
+
+
+def play(replay: Replay, speed: float = 1.0, start: int = None):
+    """ Show the replay in a pygame window, speed times as fast as the simulated time """
+    import pygame
+    from renderer import Window
+
+    window = Window(replay.world)
+    state = {'step': float(replay.first_step if start is None else start), 'speed': speed, 'paused': False}
+    seek_steps = SEEK_SECONDS / replay.timestep_length
+
+    def on_key(key):
+        if key == pygame.K_SPACE:
+            state['paused'] = not state['paused']
+        elif key == pygame.K_RIGHT:
+            state['step'] += seek_steps
+        elif key == pygame.K_LEFT:
+            state['step'] -= seek_steps
+        elif key == pygame.K_UP:
+            state['speed'] *= 2
+        elif key == pygame.K_DOWN:
+            state['speed'] /= 2
+        elif key == pygame.K_HOME:
+            state['step'] = replay.first_step
+        state['step'] = min(max(state['step'], replay.first_step), replay.last_step)
+
+    last_frame = time.perf_counter()
+    while window.show(replay.frame(int(state['step'])), on_key):
+        now = time.perf_counter()
+        if not state['paused']:
+            state['step'] = min(state['step'] + state['speed'] * (now - last_frame) / replay.timestep_length,
+                                replay.last_step)
+        last_frame = now
+    pygame.quit()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded simulation run.')
+    parser.add_argument('settings_file', help='the settings yaml file the run was made with')
+    parser.add_argument('trajectory_directory', help='the trajectory_directory of the run')
+    parser.add_argument('--speed', type=float, default=1.0, help='playback speed relative to simulated time')
+    parser.add_argument('--start', type=int, default=None, help='step to start at')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    play(Replay(Settings(args.settings_file), args.trajectory_directory), args.speed, args.start)
+
+
+if __name__ == "__main__":
+    main()
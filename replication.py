@@ -0,0 +1,198 @@
+""" Run independent seeded replications of one settings file until the metrics are known precisely enough.
+
+To run: replication settings_file --precision 0.05 --out replications.csv
+
+Replications run in a pool of worker processes. Their results are folded into running means in replication order,
+so where the run stops does not depend on which worker finished first. It stops once the confidence interval of every
+metric is within the precision (relative to the mean, or absolute with --absolute), or at --max-replications.
+Every replication writes its own output files: a metrics_file of m.csv becomes m.r<replication>.csv.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+from math import sqrt
+from statistics import NormalDist
+
+import numpy as np
+
+from random_streams import replication_seed
+from settings import Settings
+from simulation import Simulation
+from sweep import separate_outputs, worker_pool, write_results
+
+# the metrics that have to converge by default. crashes is not one: its mean is a small count near 0, so an interval
+# within a fraction of it takes thousands of replications. Check counts like it with an absolute precision.
+METRICS = ('cars_in_per_second', 'cars_out_per_second', 'average_speed')
+# set once the replications still running are not needed; the forked workers then stop at their next step
+_stop = None
+
+
+def t_quantile(probability: float, degrees_of_freedom: int) -> float:
+    """ Quantile of Student's t distribution (Cornish-Fisher expansion around the normal quantile).
+    From 2 degrees of freedom on it is within 5% of the exact value up to 99% confidence; at 1 it is 11% low
+    (11.3 for 12.706 at 95%).
+    """
+    z = NormalDist().inv_cdf(probability)
+    v = degrees_of_freedom
+    return (z
+            + (z**3 + z) / (4 * v)
+            + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * v**2)
+            + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * v**3)
+            + (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / (92160 * v**4))
+
+
+class RunningStat:
+    """ Running mean and variance of a stream of values (Welford's algorithm) """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """ Sample variance """
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def half_width(self, confidence: float = 0.95) -> float:
+        """ Half the width of the confidence interval of the mean """
+        if self.count < 2:
+            return float('inf')
+        return t_quantile(0.5 + confidence / 2, self.count - 1) * sqrt(self.variance / self.count)
+
+    def precise_enough(self, precision: float, confidence: float = 0.95, relative: bool = True) -> bool:
+        target = precision * abs(self.mean) if relative else precision
+        return self.half_width(confidence) <= target
+
+
+def run_replication(task) -> tuple[int, dict] | None:
+    """ Run one replication and return (replication, metrics row), or None if it was stopped """
+    my_settings, seed, replication = task
+    my_settings = {**my_settings, 'seed': replication_seed(seed, replication)}
+    separate_outputs(my_settings, replication)
+    simulation = Simulation(my_settings)
+    while not simulation.finished():
+        if _stop is not None and _stop.is_set():
+            simulation.close()
+            return None
+        simulation.step()
+    simulation.close()
+    return replication, simulation.result().as_row()
+
+
+def _set_stop(stop):
+    global _stop
+    _stop = stop
+
+
+def run_replications(my_settings, precision: float = 0.05, confidence: float = 0.95, relative: bool = True,
+                     metrics=METRICS, min_replications: int = 5, max_replications: int = 100,
+                     workers: int = None, on_replication=None) -> tuple[list[dict], dict[str, RunningStat]]:
+    """ Run replications until every metric's confidence interval is within precision, or max_replications.
+    on_replication(row, stats) is called after every replication is folded in.
+    Return the row of every replication used and the running statistics of every metric.
+    At least 3 replications are needed, as t_quantile is too small for the interval of 2.
+    """
+    if min_replications < 3:
+        raise ValueError('min_replications must be at least 3')
+    seed = my_settings.get('seed')
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    workers = min(workers or os.cpu_count(), max_replications)
+    stats = {metric: RunningStat() for metric in metrics}
+    rows = []
+    finished = queue.Queue()
+    # results that arrived before an earlier replication did
+    pending = {}
+    submitted = received = 0
+    stop = multiprocessing.get_context('fork').Event()
+    pool = worker_pool(workers, initializer=_set_stop, initargs=(stop,))
+
+    def submit():
+        nonlocal submitted
+        pool.apply_async(run_replication, ((my_settings, seed, submitted),),
+                         callback=finished.put, error_callback=finished.put)
+        submitted += 1
+
+    def converged():
+        return len(rows) >= min_replications and all(
+            stat.precise_enough(precision, confidence, relative) for stat in stats.values())
+
+    try:
+        for _ in range(workers):
+            submit()
+        while received < submitted and not converged():
+            outcome = finished.get()
+            received += 1
+            if isinstance(outcome, BaseException):
+                raise outcome
+            replication, row = outcome
+            pending[replication] = row
+            while len(rows) in pending and not converged():
+                row = {'replication': len(rows), 'seed': seed, **pending.pop(len(rows))}
+                rows.append(row)
+                for metric, stat in stats.items():
+                    stat.add(row[metric])
+                if on_replication is not None:
+                    on_replication(row, stats)
+            if not converged() and submitted < max_replications:
+                submit()
+    finally:
+        # replications still running once the metrics converged, or after one failed, give up instead of finishing
+        stop.set()
+        pool.close()
+        pool.join()
+    return rows, stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run seeded replications of a simulation until the metrics converge.')
+    parser.add_argument('settings_file', help='the simulation settings yaml file')
+    parser.add_argument('--precision', type=float, default=0.05,
+                        help='largest confidence interval half-width, as a fraction of the mean (default 0.05)')
+    parser.add_argument('--absolute', action='store_true', help='the precision is in the units of the metrics')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--metrics', nargs='+', default=list(METRICS),
+                        help='the metrics that have to converge (small counts such as crashes need --absolute)')
+    parser.add_argument('--min-replications', type=int, default=5, help='at least 3 (default 5)')
+    parser.add_argument('--max-replications', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--out', default=None, help='file for the per-replication rows (.csv or .jsonl)')
+    parser.add_argument('--loglevel', default='WARNING', help='log level for the runs, overriding the settings')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    my_settings = Settings(args.settings_file)
+    my_settings['loglevel'] = args.loglevel
+    # the forked workers inherit the root logger, which has to let the runs' messages through
+    logging.getLogger().setLevel(args.loglevel)
+
+    def report(row, stats):
+        intervals = ' '.join(f'{metric}={stat.mean:.3f}±{stat.half_width(args.confidence):.3f}'
+                             for metric, stat in stats.items())
+        print(f"replication {row['replication']}: {intervals}")
+
+    rows, stats = run_replications(my_settings, args.precision, args.confidence, not args.absolute, args.metrics,
+                                   min_replications=args.min_replications, max_replications=args.max_replications,
+                                   workers=args.workers, on_replication=report)
+    converged = all(stat.precise_enough(args.precision, args.confidence, not args.absolute) for stat in stats.values())
+    print(f"{'Converged' if converged else 'Did not converge'} after {len(rows)} replications "
+          f"({args.confidence:.0%} confidence intervals):")
+    for metric, stat in stats.items():
+        print(f'{metric}: {stat.mean:.3f} ± {stat.half_width(args.confidence):.3f}')
+    if args.out:
+        write_results(rows, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,9 @@ class Signal:
     def controls(self, lane):
         return False
 
+    def retime(self, cycle_time, yellow_time, the_time=0.0):
+        pass
+
 
 class TrafficLightColor(IntEnum):
     GREEN = 0
@@ -48,6 +51,8 @@ class TrafficLightColor(IntEnum):
 
 
 class TrafficHead:
+    __slots__ = ('lane', 'position', 'color')
+
     def __init__(self,
                  position: float,
                  my_lane,
@@ -96,6 +101,14 @@ class TrafficLight(Signal):
             for traffic_light in self.traffic_heads:
                 traffic_light.change()
 
+    def retime(self, cycle_time: float, yellow_time: float, the_time: float = 0.0):
+        """ Change the timing of a running light at the_time. The current phase is stretched or cut to the new cycle
+        time; a phase cut shorter than the time it has already run ends at the_time.
+        """
+        self._next_change = max(the_time, self._next_change + cycle_time - self.cycle_time)
+        self.cycle_time = cycle_time
+        self.yellow_time = yellow_time
+
     def draw(self):
         drawings = []
         for d in self.traffic_heads:
@@ -0,0 +1,446 @@
+import logging
+from dataclasses import dataclass, field, asdict
+from math import floor
+
+from signal import TrafficLight, TrafficLightColor, TrafficHead
+from collision_detector import Detector
+from lane import Lane
+from generator import Generator, ArrivalScheduler
+from objects import GlobalObjectList
+from road import Road
+from state_store import VehicleStateStore
+from spatial_index import SpatialGrid
+from batch_planner import plan_all
+from constants import ROUNDING
+from tracing import trace, log_level, TraceEvent, BinaryEventSink
+from random_streams import RandomStreams
+from checkpoint import save_checkpoint
+from recorder import TrajectoryRecorder
+from metrics import WindowMetrics
+from profiler import StepProfiler, NO_PROFILER
+
+# the settings that say which files a run writes besides its result
+OUTPUT_SETTINGS = ('trace_file', 'trajectory_directory', 'metrics_file', 'metrics_window', 'profile', 'profile_file',
+                   'cprofile_file', 'checkpoint_every', 'checkpoint_file')
+
+
+def build_world(my_settings, random_streams: RandomStreams = None) -> GlobalObjectList:
+    """ Build the roads, lanes, generators and traffic light described by the settings.
+    Every generator gets its own stream from random_streams, which defaults to one seeded by the seed setting.
+    """
+    if random_streams is None:
+        random_streams = RandomStreams(my_settings.get('seed'))
+    # init your global objects list
+    global_objects_list = GlobalObjectList()
+    if my_settings.get('state_store', False):
+        global_objects_list.set_state_store(VehicleStateStore())
+    road_list = my_settings['roads']
+    # init all Roads
+    for road_settings in road_list:
+        road_length = road_settings['length']
+        current_road = Road(road_length, road_settings['direction'], road_settings['speed_limit'])
+        global_objects_list.add_road(current_road)
+
+        # init this road's lanes
+        for lane_num, lane_settings in enumerate(road_settings['lanes']):
+            my_generator = Generator(global_objects_list, lane_settings["generator"], lane_settings['flow_direction'], current_road.get_direction(),
+                                     rng=random_streams.lane_stream())
+            my_lane = Lane(lane_num, current_road, lane_settings['width'],
+                           global_objects_list, my_generator, lane_settings['flow_direction'])
+            global_objects_list.add_lane(my_lane)
+
+    # init the traffic light
+    if "traffic_light" in my_settings.get('intersection', {}):
+        light_settings = my_settings['intersection']['traffic_light']
+        roads = global_objects_list.get_roads()
+        colors = [TrafficLightColor.GREEN, TrafficLightColor.RED]
+        initial_colors = {
+            rd: colors[i]
+            for i, rd in enumerate(roads)
+        }
+        heads = []
+        for lane in global_objects_list.get_lanes():
+            other_road = [rd for rd in roads if rd is not lane.road]
+            position = other_road[0].get_width(global_objects_list)/2 if other_road else 0
+            heads.append(TrafficHead(position, lane, initial_colors[lane.road]))
+        light = TrafficLight(light_settings['cycle_time'], light_settings['yellow_time'], heads)
+        global_objects_list.add_light(light)
+    return global_objects_list
+
+
+@dataclass
+class RunResult:
+    """ The summary of one simulation run """
+    crashes: int
+    throughput: int
+    throughput_out: int
+    cars_in_per_second: float
+    cars_out_per_second: float
+    average_speed: float
+    # descriptions of the objects that crashed
+    crashed: list[str] = field(default_factory=list)
+
+    def as_row(self) -> dict:
+        """ The numeric metrics, e.g. for one row of a results table """
+        row = asdict(self)
+        del row['crashed']
+        return row
+
+
+class Simulation:
+    """ One simulation run: the world built from the settings plus the time loop state.
+    Call step() once per timestep, or run() to go to the end.
+    """
+
+    def __init__(self, my_settings):
+        self.settings = my_settings
+        self.random_streams = RandomStreams(my_settings.get('seed'))
+        self.world = build_world(my_settings, self.random_streams)
+        self.total_timesteps = my_settings["simulation_timesteps"]
+        self.timestep_length = my_settings["timestep"]
+        self.detector = Detector(self.world)
+        # the drivers travelling along each axis; a driver looks for crossing traffic in the other axis' index
+        visibility = my_settings['visibility']
+        self.spatial_indexes = {'x': SpatialGrid(visibility), 'y': SpatialGrid(visibility)}
+        self.batch_planning = my_settings.get('batch_planner', False)
+        self.lanes: list[Lane] = self.world.get_lanes()
+        # the lanes in order of their next arrival
+        self.arrivals = ArrivalScheduler(self.lanes)
+        # the level this run logs at, whatever other simulations in the process use
+        self.log_level = log_level(my_settings['loglevel'])
+
+        self.loop = 0
+        self.throughput = 0
+        self.throughput_out = 0
+        self.crashes = 0
+        self.final_crashed = []
+        self.final_crashed_ids = []
+        # sum of the average speeds of every object that left the simulation
+        self.average_speed_sum = 0
+        self._open_outputs()
+
+    def _open_outputs(self):
+        """ Start the trace, trajectory, metrics, profile and checkpoint files the settings name at this step """
+        my_settings = self.settings
+        trace_file = my_settings.get('trace_file')
+        self.trace_sink = BinaryEventSink(trace_file) if trace_file else None
+        trajectory_directory = my_settings.get('trajectory_directory')
+        self.recorder = TrajectoryRecorder(trajectory_directory, self.world) if trajectory_directory else None
+        metrics_file = my_settings.get('metrics_file')
+        self.metrics = WindowMetrics(self.world, metrics_file, my_settings.get('metrics_window', 60),
+                                     self.the_time) if metrics_file else None
+        profile, cprofile_file = my_settings.get('profile', False), my_settings.get('cprofile_file')
+        self.profiler = StepProfiler(cprofile_file) if profile or cprofile_file else NO_PROFILER
+        # save a checkpoint to checkpoint_file every checkpoint_every steps (0 for never)
+        self.checkpoint_every = my_settings.get('checkpoint_every', 0)
+        self.checkpoint_file = my_settings.get('checkpoint_file')
+
+    def update_settings(self, my_settings):
+        """ Carry changed settings over to a running simulation, e.g. one forked from a warmed-up checkpoint.
+        The run length, log level, planner, seed, traffic light timing, vehicle types and lane generators may change;
+        the timestep, the vehicle storage and the shape of the roads and lanes may not.
+        If any output setting changes, the old output files are finished and the new ones start at the current step.
+        """
+        for key in ('timestep', 'state_store'):
+            if my_settings.get(key) != self.settings.get(key):
+                raise ValueError(f"{key} cannot change in a running simulation")
+        if _road_shape(my_settings) != _road_shape(self.settings):
+            raise ValueError("roads and lanes cannot change in a running simulation")
+        outputs_changed = any(my_settings.get(key) != self.settings.get(key) for key in OUTPUT_SETTINGS)
+        if outputs_changed:
+            self.close()
+        old_settings, self.settings = self.settings, my_settings
+        self.total_timesteps = my_settings['simulation_timesteps']
+        self.batch_planning = my_settings.get('batch_planner', False)
+        self.log_level = log_level(my_settings['loglevel'])
+        light_settings = my_settings.get('intersection', {}).get('traffic_light')
+        if light_settings is not None:
+            self.world.get_light().retime(light_settings['cycle_time'], light_settings['yellow_time'],
+                                          self.the_time)
+        lane_settings = [lane for road in my_settings['roads'] for lane in road['lanes']]
+        for lane, settings in zip(self.lanes, lane_settings):
+            lane.generator.update_settings(settings['generator'])
+        if my_settings.get('seed') != old_settings.get('seed'):
+            self.reseed(my_settings.get('seed'))
+        if outputs_changed:
+            self._open_outputs()
+
+    def reseed(self, seed):
+        """ Replace every random stream with ones derived from seed, in the order build_world hands them out """
+        self.random_streams = RandomStreams(seed)
+        for lane in self.lanes:
+            lane.generator.reseed(self.random_streams.lane_stream())
+
+    @property
+    def the_time(self) -> float:
+        return self.loop * self.timestep_length
+
+    def finished(self) -> bool:
+        return self.loop >= self.total_timesteps
+
+    def run(self) -> RunResult:
+        while not self.finished():
+            self.step()
+        self.close()
+        return self.result()
+
+    def close(self):
+        """ Flush and close the trace, trajectory, metrics and profile files, if there are any """
+        if self.trace_sink is not None:
+            self.trace_sink.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.metrics is not None:
+            self.metrics.close(self.the_time)
+        self.profiler.close()
+        profile_file = self.settings.get('profile_file')
+        if profile_file and self.profiler.enabled:
+            self.profiler.save(profile_file)
+
+    def __getstate__(self):
+        """ Everything but the open trace file, for checkpoints """
+        state = self.__dict__.copy()
+        trace_sink = state.pop('trace_sink')
+        if trace_sink is not None:
+            trace_sink.flush()
+        state['_trace_records'] = trace_sink.count if trace_sink is not None else 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.trace_sink = None
+
+    def reopen_trace(self):
+        """ Continue the trace file of a restored run from where the checkpoint was taken """
+        trace_file = self.settings.get('trace_file')
+        if trace_file:
+            self.trace_sink = BinaryEventSink(trace_file, keep_records=self._trace_records)
+
+    def step(self):
+        """ Advance the simulation by one timestep """
+        the_time = self.the_time
+        # the log level is set here once, so disabled log calls cost nothing for the rest of the step
+        trace.set_level(self.log_level)
+        if trace.info:
+            logging.info(f"Starting loop={self.loop}/{self.total_timesteps} time={the_time}s")
+        profiler = self.profiler
+        with profiler.phase('generation'):
+            self._generate(the_time)
+        with profiler.phase('perception'):
+            planners, visible_objects, lanes = self._look()
+        with profiler.phase('planning'):
+            self._plan(planners, visible_objects, lanes)
+
+        # updating the map
+        with profiler.phase('integration'):
+            self.world.get_light().update(the_time)
+            self._update_vehicles()
+
+        with profiler.phase('crash_detection'):
+            crashed_ids = self._detect_crashes()
+        with profiler.phase('end_detection'):
+            self._remove_finished(crashed_ids)
+        if self.recorder is not None:
+            # the vehicles left once the step is done, as the window shows them
+            with profiler.phase('recording'):
+                self.recorder.record(self.loop)
+        self.loop += 1
+        if self.metrics is not None:
+            with profiler.phase('metrics'):
+                self.metrics.on_step(self.the_time)
+        if self.checkpoint_every and self.checkpoint_file and self.loop % self.checkpoint_every == 0:
+            with profiler.phase('checkpoint'):
+                save_checkpoint(self, self.checkpoint_file)
+
+    def _generate(self, the_time):
+        # generate objects
+        my_settings = self.settings
+        due_lanes = self.arrivals.due(the_time)
+        for this_lane in due_lanes:
+            if this_lane.generator.should_generate(the_time, this_lane):
+                road_speed_limit = this_lane.get_speed_limit()
+                x0, y0 = this_lane.get_position(0)
+                endx, endy = this_lane.get_position(1)
+                new_driver = this_lane.generator.generate(x0, y0, my_settings['visibility'], endx, endy, road_speed_limit, my_settings)
+                self.world[new_driver.object_id] = new_driver
+                this_lane.add(new_driver.object_id)
+                if self.metrics is not None:
+                    self.metrics.on_generate(this_lane)
+                if self.trace_sink is not None:
+                    vehicle = new_driver.my_vehicle
+                    self.trace_sink.write(self.loop, TraceEvent.GENERATE, new_driver.object_id, vehicle.x, vehicle.y, vehicle.speed)
+                if trace.info:
+                    logging.info(f"Generating a vehicle={new_driver.object_id} in lane={this_lane} position=({x0}, {y0}), destination=({endx}, {endy}) of type {new_driver.my_vehicle}")
+                self.throughput += 1
+        for this_lane in due_lanes:
+            self.arrivals.schedule(this_lane)
+
+    def _look(self) -> tuple[list, list, list]:
+        """ Return the drivers that plan this step, what each of them sees, and their lanes """
+        world = self.world
+        self._index_traffic()
+        planners, planner_visible_objects, planner_lanes = [], [], []
+        # every driver's attentiveness coin flip for this step, drawn at once
+        draws = self.random_streams.should_plan_draws(len(world))
+        for this_driver, draw in zip(world.values(), draws):
+            lane = world.get_lane_of(this_driver.object_id)
+            if lane is not None and this_driver.should_plan(draw):
+                planners.append(this_driver)
+                planner_visible_objects.append(self._crossing_traffic(this_driver, lane))
+                planner_lanes.append(lane)
+        return planners, planner_visible_objects, planner_lanes
+
+    def _index_traffic(self):
+        """ Index the drivers' current positions. Positions do not change while planning, so this serves every
+        look() and leader lookup of a step.
+        """
+        by_axis = {'x': [], 'y': []}
+        for driver in self.world.values():
+            by_axis[driver._get_direction_x_or_y()].append(driver)
+        for axis, drivers in by_axis.items():
+            self.spatial_indexes[axis].rebuild(drivers)
+        for lane in self.lanes:
+            lane.reorder()
+
+    def _crossing_traffic(self, this_driver, lane) -> list:
+        """ The crossing drivers this_driver can see. Driver.plan only checks those in lanes the light does not
+        control, and follows traffic going its way through the lane's leader, so nothing else is looked up.
+        """
+        if self.world.get_light().controls(lane):
+            return []
+        other_axis = 'y' if this_driver._get_direction_x_or_y() == 'x' else 'x'
+        return this_driver.look(self.world, self.spatial_indexes[other_axis])
+
+    def _plan(self, planners: list, planner_visible_objects: list, planner_lanes: list):
+        # plan next steps
+        world = self.world
+        timestep_length = self.timestep_length
+        if self.profiler.enabled:
+            # the pairs plan checks: every driver's leader and the crossing traffic it sees
+            self.profiler.count('plan_pairs', sum(len(visible_objects) for visible_objects in planner_visible_objects)
+                                + sum(this_driver.leader_in_sight(lane) is not None
+                                      for this_driver, lane in zip(planners, planner_lanes)))
+        if self.batch_planning:
+            # every driver plans against the same snapshot, then all of them accelerate
+            accel_changes = plan_all(planners, planner_visible_objects, planner_lanes, timestep_length,
+                                     traffic_light=world.get_light())
+            for this_driver, accel_change in zip(planners, accel_changes):
+                this_driver.accelerate(accel_change)
+                self._trace_plan(this_driver, accel_change)
+        else:
+            # one driver at a time, so later drivers see the new acceleration of earlier ones
+            for this_driver, visible_objects, lane in zip(planners, planner_visible_objects, planner_lanes):
+                accel_change = this_driver.plan(visible_objects, lane.get_speed_limit(), timestep_length, lane, traffic_light=world.get_light())
+                this_driver.accelerate(accel_change)
+                self._trace_plan(this_driver, accel_change)
+                if trace.debug:
+                    logging.debug(f"{this_driver.object_id=} acceleration ={this_driver.my_vehicle.acceleration}")
+
+    def _trace_plan(self, this_driver, accel_change):
+        if self.trace_sink is not None:
+            vehicle = this_driver.my_vehicle
+            self.trace_sink.write(self.loop, TraceEvent.PLAN, this_driver.object_id, vehicle.x, vehicle.y, accel_change)
+
+    def _update_vehicles(self):
+        state_store = self.world.get_state_store()
+        if state_store is not None:
+            # every vehicle lives in the store, so integrate them all in one vectorized pass
+            state_store.update(self.timestep_length)
+        else:
+            for this_driver in self.world.values():
+                this_driver.my_vehicle.update(self.timestep_length)
+                if trace.debug:
+                    logging.debug(f"Updating {this_driver}")
+
+    def _detect_crashes(self) -> list[int]:
+        world = self.world
+        crashed_ids = self.detector.detect_crashes()
+        self.profiler.count('crash_candidate_pairs', self.detector.candidate_pairs)
+        self.crashes += floor(len(crashed_ids)/2)
+        if crashed_ids and trace.info:
+            crashed_list = [world[crashed_id] for crashed_id in crashed_ids]
+            logging.info(f'Objects {crashed_ids} crashed.')
+            logging.info(f'Crashed objects: {crashed_list}')
+        if self.trace_sink is not None:
+            for crashed_id in crashed_ids:
+                vehicle = world[crashed_id].my_vehicle
+                self.trace_sink.write(self.loop, TraceEvent.CRASH, crashed_id, vehicle.x, vehicle.y, vehicle.speed)
+        if trace.debug:
+            logging.debug(f'crashed_ids={crashed_ids}')
+
+        self.final_crashed_ids += crashed_ids
+        self.final_crashed.extend(world[crashed_id] for crashed_id in crashed_ids)
+        return crashed_ids
+
+    def _remove_finished(self, crashed_ids: list[int]):
+        world = self.world
+        finished_ids = crashed_ids.copy()
+        crashed = set(crashed_ids)
+        # remove objects that crashed or move off the board
+        for lane in self.lanes:
+            finished_ids += lane.detect_end()
+        if trace.debug:
+            logging.debug(f'finished_ids={finished_ids}')
+        # remove objects that move off the board
+        for finished_object in finished_ids:
+            if finished_object in world:
+                the_object = world[finished_object]
+
+                if trace.info:
+                    logging.info(f"Object {finished_object} being removed with a length of {the_object.my_vehicle.length} with location ({the_object.my_vehicle.x, the_object.my_vehicle.y}).")
+                lane = world.get_lane_of(finished_object)
+                if lane is not None:
+                    lane.remove(finished_object)
+                average_speed = the_object.my_vehicle.average_speed()
+                self.average_speed_sum += average_speed
+                if self.metrics is not None and lane is not None:
+                    if finished_object in crashed:
+                        self.metrics.on_crash(lane)
+                    else:
+                        self.metrics.on_finish(lane, average_speed)
+                if self.trace_sink is not None:
+                    self.trace_sink.write(self.loop, TraceEvent.REMOVE, finished_object,
+                                          the_object.my_vehicle.x, the_object.my_vehicle.y, average_speed)
+                del world[finished_object]
+                if finished_object in crashed:
+                    # crashed drivers are kept for the run summary, so they keep their final state
+                    the_object.my_vehicle.release()
+                else:
+                    world.recycle(the_object)
+            else:
+                logging.warning(f'Sim is trying to delete an object id={finished_object} that it already deleted. Ignoring it.')
+        self.throughput_out += len(finished_ids)-len(crashed_ids)
+
+    def result(self) -> RunResult:
+        """ Summarize the run so far """
+        average_speed = self.average_speed_sum
+        for obj in self.world.values():
+            average_speed += obj.my_vehicle.average_speed()
+        average_speed = round(average_speed / self.throughput, ROUNDING) if self.throughput else 0.0
+        simulated_seconds = self.loop * self.timestep_length
+        cars_in_per_second = round(self.throughput/simulated_seconds, ROUNDING) if simulated_seconds else 0.0
+        cars_out_per_second = round(self.throughput_out/simulated_seconds, ROUNDING) if simulated_seconds else 0.0
+        return RunResult(crashes=self.crashes,
+                         throughput=self.throughput,
+                         throughput_out=self.throughput_out,
+                         cars_in_per_second=cars_in_per_second,
+                         cars_out_per_second=cars_out_per_second,
+                         average_speed=average_speed,
+                         crashed=[str(f) for f in self.final_crashed])
+
+
+def _road_shape(my_settings) -> list:
+    """ Everything about the roads and lanes except the generators """
+    return [({key: value for key, value in road.items() if key != 'lanes'},
+             [{key: value for key, value in lane.items() if key != 'generator'} for lane in road['lanes']])
+            for road in my_settings['roads']]
+
+
+def run(my_settings) -> RunResult:
+    """ Run a whole simulation headless and return its summary """
+    return Simulation(my_settings).run()
+
+
+def run_many(settings_list) -> list[RunResult]:
+    """ Run several simulations back-to-back in this process, each in its own world """
+    return [run(my_settings) for my_settings in settings_list]
@@ -0,0 +1,50 @@
+from collections import defaultdict
+from math import floor
+
+
+class SpatialGrid:
+    """ Uniform grid over the front and rear points of every driver, rebuilt once per timestep.
+    near() returns every driver that could have an end point within a radius of one of the given driver's
+    end points, in the order the drivers were given to rebuild().
+    """
+
+    def __init__(self, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError(f"cell_size must be positive, got {cell_size}")
+        self.cell_size = cell_size
+        self._cells = defaultdict(list)
+        self._order = {}
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return floor(x / self.cell_size), floor(y / self.cell_size)
+
+    def rebuild(self, drivers):
+        """ Index the current positions of all drivers """
+        self._cells = defaultdict(list)
+        self._order = {}
+        for order, driver in enumerate(drivers):
+            self._order[driver] = order
+            front = self._cell(driver.my_vehicle.x, driver.my_vehicle.y)
+            rear = self._cell(*driver.my_vehicle.get_rear())
+            self._cells[front].append(driver)
+            if rear != front:
+                self._cells[rear].append(driver)
+        return self
+
+    def near(self, driver, radius: float) -> list:
+        """ Return the candidate drivers (excluding driver) that may be within radius of driver """
+        # one extra ring of cells guards against rounding in the cell computation
+        span = floor(radius / self.cell_size) + 1
+        found = set()
+        cells = self._cells
+        front = self._cell(driver.my_vehicle.x, driver.my_vehicle.y)
+        rear = self._cell(*driver.my_vehicle.get_rear())
+        for cell_x, cell_y in {front, rear}:
+            for i in range(cell_x - span, cell_x + span + 1):
+                for j in range(cell_y - span, cell_y + span + 1):
+                    in_cell = cells.get((i, j))
+                    if in_cell:
+                        found.update(in_cell)
+        found.discard(driver)
+        order = self._order
+        return sorted(found, key=order.__getitem__)
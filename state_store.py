@@ -0,0 +1,160 @@
+import numpy as np
+
+import constants
+from utils import heading_of
+from vehicle import Vehicle
+
+
+class VehicleStateStore:
+    """ Structure-of-arrays storage for the kinematic state of every vehicle in a run.
+    Each vehicle owns one slot (an index into every column). Released slots go on a free-list and are reused.
+    """
+    COLUMNS = ('x', 'y', 'speed', 'acceleration', 'angle', 'length', 'width', 'max_speed', 'max_acceleration',
+               'my_distance', 'my_time')
+    # rounded cos/sin of the angle column, refreshed only when an angle changes
+    _HEADING_COLUMNS = ('cos_angle', 'sin_angle')
+
+    def __init__(self, capacity: int = 64):
+        capacity = max(capacity, 1)
+        for column in self.COLUMNS + self._HEADING_COLUMNS:
+            setattr(self, column, np.zeros(capacity))
+        self.active = np.zeros(capacity, dtype=bool)
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.active))
+
+    @property
+    def capacity(self) -> int:
+        return len(self.active)
+
+    def allocate(self) -> int:
+        """ Reserve a slot and return its index """
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self.active[slot] = True
+        return slot
+
+    def release(self, slot: int):
+        """ Return a slot to the free-list """
+        if not self.active[slot]:
+            raise ValueError(f"Releasing slot {slot} that is not in use")
+        self.active[slot] = False
+        for column in self.COLUMNS + self._HEADING_COLUMNS:
+            getattr(self, column)[slot] = 0.0
+        self._free.append(slot)
+
+    def _grow(self):
+        old_capacity = self.capacity
+        new_capacity = old_capacity * 2
+        for column in self.COLUMNS + self._HEADING_COLUMNS:
+            new_column = np.zeros(new_capacity)
+            new_column[:old_capacity] = getattr(self, column)
+            setattr(self, column, new_column)
+        active = np.zeros(new_capacity, dtype=bool)
+        active[:old_capacity] = self.active
+        self.active = active
+        self._free.extend(range(new_capacity - 1, old_capacity - 1, -1))
+
+    def set_angle(self, slot: int, angle: float):
+        self.angle[slot] = angle
+        heading = heading_of(angle)
+        self.cos_angle[slot] = heading.dx
+        self.sin_angle[slot] = heading.dy
+
+    def copy_slot(self, other: 'VehicleStateStore', other_slot: int, slot: int):
+        """ Copy one slot of another store into a slot of this store """
+        for column in self.COLUMNS + self._HEADING_COLUMNS:
+            getattr(self, column)[slot] = getattr(other, column)[other_slot]
+
+    def update(self, timestep_length: float):
+        """ Vectorized equivalent of Vehicle.update for every vehicle in the store """
+        slots = np.flatnonzero(self.active)
+        if not len(slots):
+            return
+        speed = self.speed[slots]
+        acceleration = self.acceleration[slots]
+        if (speed < 0).any():
+            raise ValueError('Speed must be more then or equal to 0')
+        moving_time = np.full(len(slots), float(timestep_length))
+        braking = acceleration < 0
+        moving_time[braking] = np.minimum(-speed[braking] / acceleration[braking], timestep_length)
+
+        cos_angle = self.cos_angle[slots]
+        sin_angle = self.sin_angle[slots]
+        old_x = self.x[slots]
+        old_y = self.y[slots]
+        # same operation order as Vehicle.pretend_update so the results match the per-object path
+        new_x = (cos_angle * speed) * moving_time + 0.5 * (cos_angle * acceleration) * moving_time * moving_time + old_x
+        new_y = (sin_angle * speed) * moving_time + 0.5 * (sin_angle * acceleration) * moving_time * moving_time + old_y
+        distance_x = new_x - old_x
+        distance_y = new_y - old_y
+
+        self.x[slots] = new_x
+        self.y[slots] = new_y
+        self.my_distance[slots] += np.sqrt(distance_x * distance_x + distance_y * distance_y)
+        speed = speed + acceleration * moving_time
+        speed = np.minimum(np.maximum(speed, 0), self.max_speed[slots])
+        self.speed[slots] = np.round(speed, constants.ROUNDING)
+        self.my_time[slots] += timestep_length
+
+
+def _column(name: str) -> property:
+    def fget(self):
+        return float(getattr(self._store, name)[self._slot])
+
+    def fset(self, value):
+        getattr(self._store, name)[self._slot] = value
+
+    return property(fget, fset)
+
+
+class StoredVehicle(Vehicle):
+    """ A Vehicle that is a thin view into a VehicleStateStore slot.
+    Everything else (turn signal, max angle) stays on the object.
+    """
+    __slots__ = ('_store', '_slot')
+    x = _column('x')
+    y = _column('y')
+    speed = _column('speed')
+    acceleration = _column('acceleration')
+    length = _column('length')
+    width = _column('width')
+    max_speed = _column('max_speed')
+    max_acceleration = _column('max_acceleration')
+    my_distance = _column('my_distance')
+    my_time = _column('my_time')
+
+    def __init__(self, store: VehicleStateStore, *args, **kwargs):
+        self._store = store
+        super().__init__(*args, **kwargs)
+
+    def reset(self, *args, **kwargs):
+        """ Take a slot in the store and set it up as a new vehicle """
+        self._slot = self._store.allocate()
+        super().reset(*args, **kwargs)
+        vehicle_type = self.vehicle_type
+        for name in ('length', 'width', 'max_speed', 'max_acceleration'):
+            setattr(self, name, getattr(vehicle_type, name))
+
+    @property
+    def angle(self):
+        return float(self._store.angle[self._slot])
+
+    @angle.setter
+    def angle(self, value):
+        self._store.set_angle(self._slot, value)
+
+    def release(self, keep_state: bool = True):
+        """ Give the slot back to the store, keeping a private copy of the final state for reporting.
+        Without keep_state the vehicle stays tied to the store, to take a new slot when it is reset.
+        """
+        if not keep_state:
+            self._store.release(self._slot)
+            return
+        snapshot = VehicleStateStore(capacity=1)
+        slot = snapshot.allocate()
+        snapshot.copy_slot(self._store, self._slot, slot)
+        self._store.release(self._slot)
+        self._store, self._slot = snapshot, slot
@@ -0,0 +1,209 @@
+""" Run a base settings file over a grid of parameter values in a pool of worker processes.
+
+To run: sweep base_settings_file grid_file --out results.csv
+
+The grid file maps dotted settings paths to the list of values to try. Every combination is run.
+List entries are picked by index, or all of them with *:
+
+    intersection.traffic_light.cycle_time: [30, 60, 90]
+    roads.*.lanes.*.generator.flow: [0.5, 1, 2]
+
+With --warmup N the base settings are run for N steps once, and every run continues from a copy of that state
+with its overrides applied (see Simulation.update_settings for what may change). Replications then share the
+warm-up and differ from step N on.
+
+Every run writes its own output files: a metrics_file of m.csv becomes m.c<combination>.r<replication>.csv, and the
+trajectory_directory, trace_file, profile_file, cprofile_file and checkpoint_file are named the same way.
+"""
+import argparse
+import copy
+import csv
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+
+import numpy as np
+import yaml
+
+from checkpoint import dumps, loads
+from random_streams import replication_seed
+from settings import Settings
+from simulation import Simulation, run
+
+# checkpoint of the warmed-up base run in a worker process, or None to start every run from scratch
+_warm_start = None
+# settings naming a file a run writes to; every run of a sweep or of a set of replications writes its own
+OUTPUT_PATHS = ('metrics_file', 'trajectory_directory', 'trace_file', 'profile_file', 'cprofile_file',
+                'checkpoint_file')
+
+
+def set_path(my_settings, path: str, value):
+    """ Set a dotted settings path (e.g. roads.*.lanes.0.width) to value, in place """
+    keys = path.split('.')
+    targets = [my_settings]
+    for key in keys[:-1]:
+        targets = [child for target in targets for child in _children(target, key)]
+    for target in targets:
+        last = keys[-1]
+        if isinstance(target, list):
+            target[int(last)] = value
+        elif last not in target:
+            raise KeyError(f"{path} is not in the settings")
+        else:
+            target[last] = value
+
+
+def _children(target, key: str) -> list:
+    if isinstance(target, list):
+        return list(target) if key == '*' else [target[int(key)]]
+    if key == '*':
+        return list(target.values())
+    return [target[key]]
+
+
+def expand_grid(grid: dict) -> list[dict]:
+    """ Return every combination of the grid's values as a {path: value} dict """
+    paths = list(grid)
+    return [dict(zip(paths, values)) for values in itertools.product(*(grid[path] for path in paths))]
+
+
+def apply_overrides(base_settings, overrides: dict):
+    """ Return a copy of the settings with the overrides applied """
+    my_settings = copy.deepcopy(dict(base_settings))
+    for path, value in overrides.items():
+        set_path(my_settings, path, value)
+    return my_settings
+
+
+def run_output_path(path: str, replication: int, combination: int = None) -> str:
+    """ The path with the run added before its extension: <stem>.c<combination>.r<replication><ext> """
+    stem, extension = os.path.splitext(path.rstrip(os.sep))
+    run_name = f'.r{replication}' if combination is None else f'.c{combination}.r{replication}'
+    return stem + run_name + extension
+
+
+def separate_outputs(my_settings, replication: int, combination: int = None):
+    """ Point the settings' output files at ones of this run alone, in place, so parallel runs do not write over
+    each other's
+    """
+    for key in OUTPUT_PATHS:
+        if my_settings.get(key):
+            my_settings[key] = run_output_path(my_settings[key], replication, combination)
+
+
+def without_outputs(my_settings) -> dict:
+    """ A copy of the settings that writes no files and does not profile """
+    return {**my_settings, **{key: None for key in OUTPUT_PATHS}, 'profile': False}
+
+
+def run_task(task) -> dict:
+    """ Run one (combination, replication) of a sweep and return its results row """
+    combination, replication, base_settings, overrides = task
+    my_settings = apply_overrides(base_settings, overrides)
+    # every combination sees the same streams for a given replication, and replications are independent
+    my_settings['seed'] = replication_seed(base_settings['seed'], replication)
+    separate_outputs(my_settings, replication, combination)
+    if _warm_start is None:
+        result = run(my_settings)
+    else:
+        # a private copy of the warmed-up run, continued with this run's settings
+        simulation = loads(_warm_start)
+        simulation.update_settings(my_settings)
+        result = simulation.run()
+    return {'combination': combination, 'replication': replication, 'seed': base_settings['seed'],
+            **overrides, **result.as_row()}
+
+
+def warm_up(base_settings, steps: int) -> bytes:
+    """ Run the base settings for some steps and return the checkpoint of that state.
+    The warm-up writes no files; every run starts its own at the end of the warm-up.
+    """
+    simulation = Simulation(without_outputs(base_settings))
+    for _ in range(steps):
+        simulation.step()
+    return dumps(simulation)
+
+
+def _set_warm_start(warm_start):
+    global _warm_start
+    _warm_start = warm_start
+
+
+def worker_pool(workers: int, initializer=None, initargs=()):
+    """ A pool of worker processes for simulation runs; shut it down with close() and join().
+    The workers are forked, because spawned interpreters pick up this repository's signal.py instead of the
+    standard library's. For the same reason terminate() fails: multiprocessing finds no SIGTERM in it.
+    """
+    return multiprocessing.get_context('fork').Pool(workers, initializer=initializer, initargs=initargs)
+
+
+def run_sweep(base_settings, grid: dict, workers: int = None, replications: int = 1,
+              warmup_steps: int = 0) -> list[dict]:
+    """ Run every combination of the grid replications times and return one row per run.
+    Without a seed setting, a root seed is picked here so all the runs of the sweep still derive from one.
+    With warmup_steps, every run continues from one shared warm-up of the base settings.
+    """
+    if base_settings.get('seed') is None:
+        base_settings = {**base_settings, 'seed': np.random.SeedSequence().entropy}
+    tasks = [(combination, replication, base_settings, overrides)
+             for combination, overrides in enumerate(expand_grid(grid))
+             for replication in range(replications)]
+    workers = workers or os.cpu_count()
+    # each worker runs many simulations back-to-back, so imports and process startup are paid once per worker.
+    # Chunks of tasks cut down on round trips to the pool while still spreading the work over every worker.
+    chunksize = max(1, len(tasks) // (workers * 4))
+    warm_start = warm_up(base_settings, warmup_steps) if warmup_steps else None
+    # the forked workers get the warm-up checkpoint without it being sent through a pipe
+    pool = worker_pool(workers, initializer=_set_warm_start, initargs=(warm_start,))
+    try:
+        rows = list(pool.imap_unordered(run_task, tasks, chunksize))
+    finally:
+        pool.close()
+        pool.join()
+    return sorted(rows, key=lambda row: (row['combination'], row['replication']))
+
+
+def write_results(rows: list[dict], file_name: str):
+    """ Write the rows as csv, or as json lines if the file name ends in .jsonl """
+    if file_name.endswith('.jsonl'):
+        with open(file_name, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+        return
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    with open(file_name, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run a parameter sweep over a simulation settings file.')
+    parser.add_argument('settings_file', help='the base simulation settings yaml file')
+    parser.add_argument('grid_file', help='yaml file mapping dotted settings paths to lists of values')
+    parser.add_argument('--out', default='sweep_results.csv', help='results file (.csv or .jsonl)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--replications', type=int, default=1, help='runs of every combination')
+    parser.add_argument('--loglevel', default='WARNING', help='log level for the runs, overriding the settings')
+    parser.add_argument('--warmup', type=int, default=0,
+                        help='steps of the base settings to run once and start every run from')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    base_settings = Settings(args.settings_file)
+    base_settings['loglevel'] = args.loglevel
+    # the forked workers inherit the root logger, which has to let the runs' messages through
+    logging.getLogger().setLevel(args.loglevel)
+    with open(args.grid_file) as f:
+        grid = yaml.safe_load(f)
+    rows = run_sweep(base_settings, grid, args.workers, args.replications, args.warmup)
+    write_results(rows, args.out)
+    print(f'Wrote {len(rows)} runs to {args.out}')
+
+
+if __name__ == "__main__":
+    main()
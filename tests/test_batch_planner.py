@@ -0,0 +1,72 @@
+import glob
+import os
+import unittest
+
+from batch_planner import plan_all
+from simulation import build_world
+from settings import Settings
+from spatial_index import SpatialGrid
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STEPS = 200
+
+
+def drive(my_settings, check):
+    """ Run a scenario with the scalar planner, calling check(drivers, visible, lanes, light) before every plan """
+    world = build_world(my_settings)
+    lanes = world.get_lanes()
+    timestep_length = my_settings['timestep']
+    spatial_index = SpatialGrid(my_settings['visibility'])
+    for loop in range(STEPS):
+        the_time = loop * timestep_length
+        for lane in lanes:
+            if lane.generator.should_generate(the_time, lane):
+                x0, y0 = lane.get_position(0)
+                endx, endy = lane.get_position(1)
+                new_driver = lane.generator.generate(x0, y0, my_settings['visibility'], endx, endy,
+                                                     lane.get_speed_limit(), my_settings)
+                world[new_driver.object_id] = new_driver
+                lane.add(new_driver.object_id)
+        spatial_index.rebuild(world.values())
+        for lane in lanes:
+            lane.reorder()
+        drivers, visible, driver_lanes = [], [], []
+        for lane in lanes:
+            for driver in lane.get_objects():
+                drivers.append(driver)
+                visible.append(driver.look(world, spatial_index))
+                driver_lanes.append(lane)
+        changes = check(drivers, visible, driver_lanes, world.get_light(), timestep_length)
+        for driver, change in zip(drivers, changes):
+            driver.accelerate(change)
+        world.get_light().update(the_time)
+        for driver in world.values():
+            driver.my_vehicle.update(timestep_length)
+        for lane in lanes:
+            for finished in lane.detect_end():
+                lane.remove(finished)
+                del world[finished]
+
+
+class TestBatchPlanner(unittest.TestCase):
+    def test_parity_with_scalar_plan_on_shipped_scenarios(self):
+        pairs = []
+        for file_name in sorted(glob.glob(os.path.join(REPO_ROOT, 'simulation_settings_*.yaml'))):
+            with self.subTest(scenario=os.path.basename(file_name)):
+
+                def check(drivers, visible, lanes, light, timestep_length):
+                    scalar = [driver.plan(seen, lane.get_speed_limit(), timestep_length, lane, traffic_light=light)
+                              for driver, seen, lane in zip(drivers, visible, lanes)]
+                    assert plan_all(drivers, visible, lanes, timestep_length, light) == scalar
+                    pairs.append(sum(driver.leader_in_sight(lane) is not None
+                                     for driver, lane in zip(drivers, lanes)))
+                    return scalar
+
+                my_settings = Settings(file_name)
+                my_settings['seed'] = 1
+                drive(my_settings, check)
+        assert sum(pairs) > 0
+
+
+if __name__ == '__main__':
+    unittest.main()
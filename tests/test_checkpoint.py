@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+from checkpoint import save_checkpoint, load_checkpoint, dumps, loads
+from settings import Settings
+from simulation import Simulation
+from tracing import read_events
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def positions(simulation):
+    return [(driver.object_id, driver.my_vehicle.x, driver.my_vehicle.y, driver.my_vehicle.speed)
+            for driver in simulation.world.values()]
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        self.my_settings['simulation_timesteps'] = 300
+        self.my_settings['loglevel'] = 'WARNING'
+
+    def test_resume_continues_bit_for_bit(self):
+        for state_store in (False, True):
+            with self.subTest(state_store=state_store):
+                self.my_settings['state_store'] = state_store
+                straight = Simulation(self.my_settings)
+                expected = straight.run()
+
+                file_name = os.path.join(self.directory.name, 'run.ckpt')
+                first_half = Simulation(self.my_settings)
+                for _ in range(150):
+                    first_half.step()
+                save_checkpoint(first_half, file_name)
+                resumed = load_checkpoint(file_name)
+                assert resumed.loop == 150
+                assert resumed.run() == expected
+                assert positions(resumed) == positions(straight)
+
+    def test_checkpoint_every(self):
+        file_name = os.path.join(self.directory.name, 'every.ckpt')
+        self.my_settings['checkpoint_every'] = 100
+        self.my_settings['checkpoint_file'] = file_name
+        self.my_settings['simulation_timesteps'] = 250
+        Simulation(self.my_settings).run()
+        assert load_checkpoint(file_name).loop == 200
+
+    def test_loaded_copies_are_independent(self):
+        simulation = Simulation(self.my_settings)
+        for _ in range(100):
+            simulation.step()
+        data = dumps(simulation)
+        first, second = loads(data), loads(data)
+        first.step()
+        assert second.loop == 100
+        assert first.world is not second.world
+        with self.assertRaises(ValueError):
+            loads(b'not a checkpoint')
+
+    def test_trace_continues_from_the_checkpoint(self):
+        self.my_settings['trace_file'] = os.path.join(self.directory.name, 'straight.bin')
+        Simulation(self.my_settings).run()
+        straight = list(read_events(self.my_settings['trace_file']))
+
+        self.my_settings['trace_file'] = os.path.join(self.directory.name, 'resumed.bin')
+        simulation = Simulation(self.my_settings)
+        for _ in range(150):
+            simulation.step()
+        data = dumps(simulation)
+        # the original run goes on past the checkpoint before it dies
+        for _ in range(50):
+            simulation.step()
+        simulation.close()
+        resumed = loads(data)
+        resumed.reopen_trace()
+        resumed.run()
+        assert list(read_events(self.my_settings['trace_file'])) == straight
+
+
+if __name__ == '__main__':
+    unittest.main()
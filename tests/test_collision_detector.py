@@ -1,3 +1,4 @@
+import random
 import unittest
 from collision_detector import Detector
 from vehicle import Vehicle
@@ -115,6 +116,21 @@ class TestRealCases(unittest.TestCase):
         detected = Detector(gol).detect_end(10)
         assert 0 in detected
 
+    def test_broad_phase_matches_all_pairs(self):
+        rng = random.Random(11)
+        gol = GlobalObjectList()
+        for object_id in range(300):
+            angle = rng.choice([0, 90, 180, 270])
+            lane_offset = rng.choice([-2.5, 2.5])
+            along = rng.uniform(-150, 150)
+            x, y = (along, lane_offset) if angle % 180 == 0 else (lane_offset, along)
+            gol[object_id] = Driver(object_id=object_id, my_vehicle=MockVehicle(x=x, y=y, length=rng.uniform(0.5, 15), angle=angle),
+                                    visibility=2, destination=(4, 4), quality=mock_quality)
+        detector = Detector(gol)
+        crashed = detector.detect_crashes()
+        assert crashed
+        assert sorted(crashed) == sorted(detector.detect_crashes_all_pairs())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestHeadless(unittest.TestCase):
+    def test_core_modules_do_not_import_pygame(self):
+        code = ("import sys\n"
+                "import main, driver, generator, lane, objects, collision_detector, visuals\n"
+                "print('pygame' in sys.modules)")
+        output = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, capture_output=True, text=True,
+                                check=True).stdout
+        assert output.strip() == 'False'
+
+
+if __name__ == '__main__':
+    unittest.main()
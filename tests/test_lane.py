@@ -4,6 +4,8 @@ from lane import Lane
 from road import Road
 from objects import GlobalObjectList
 from constants import LaneDirection
+from driver import Driver, Quality
+from vehicle import Vehicle
 
 
 
@@ -47,7 +49,59 @@ class TestLane(unittest.TestCase):
         assert position_x == 0
         assert position_y == 0
 
+    def test_geometry_is_rebuilt_when_a_lane_is_added(self):
+        objects = GlobalObjectList()
+        road = Road(length=10, direction=0, speed_limit=90)
+        first = Lane(lane_num=0, my_road=road, width=4, global_objects=objects, generator=None, flow_direction=LaneDirection.FORWARD)
+        objects.add_lane(first)
+        assert first.get_position(0) == (-5, 0)
+        assert first.geometry.heading == (1, 0)
+        assert (first.geometry.min_x, first.geometry.max_x) == (-5, 5)
 
+        second = Lane(lane_num=1, my_road=road, width=4, global_objects=objects, generator=None, flow_direction=LaneDirection.FORWARD)
+        objects.add_lane(second)
+        assert first.get_position(0) == (-5, 2)
+        assert second.get_position(1) == (5, -2)
+
+    def test_add_and_remove_keep_lane_index(self):
+        objects = GlobalObjectList()
+        my_lane = Lane(lane_num=0, my_road=Road(length=10, direction=0, speed_limit=90), width=5, global_objects=objects, generator=None, flow_direction=LaneDirection.FORWARD)
+        for object_id in (3, 1, 2):
+            objects[object_id] = Driver(object_id, Vehicle(0, 0, 1, 0, 0, 1, 1, 1), 9, (2, 2), Quality())
+            my_lane.add(object_id)
+        assert list(my_lane.objects_in_lane) == [3, 1, 2]
+        assert objects.get_lane_of(1) is my_lane
+        assert my_lane.tail() is objects[2]
+        assert objects[1] in my_lane
+        with self.assertRaises(ValueError):
+            my_lane.add(1)
+
+        my_lane.remove(1)
+        assert list(my_lane.objects_in_lane) == [3, 2]
+        assert objects.get_lane_of(1) is None
+        assert objects[1] not in my_lane
+
+    def test_leader_and_follower(self):
+        objects = GlobalObjectList()
+        my_lane = Lane(lane_num=0, my_road=Road(length=100, direction=0, speed_limit=90), width=5, global_objects=objects, generator=None, flow_direction=LaneDirection.BACKWARD)
+        objects.add_lane(my_lane)
+        # the lane runs toward -x; 2 passed 1 since they were added
+        for object_id, x in ((1, -10), (2, -20), (3, 30)):
+            objects[object_id] = Driver(object_id, Vehicle(x, 0, 1, 0, 0, 1, 1, 1, angle=180), 9, (-50, 0), Quality())
+            my_lane.add(object_id)
+        my_lane.reorder()
+        first, second, third = objects[2], objects[1], objects[3]
+        assert my_lane.leader(first) is None
+        assert my_lane.leader(second) is first
+        assert my_lane.leader(third) is second
+        assert my_lane.follower(first) is second
+        assert my_lane.follower(third) is None
+        # 1 is 9 meters behind 2, just within sight; 3 is far behind 1
+        assert second.leader_in_sight(my_lane) is first
+        assert third.leader_in_sight(my_lane) is None
+        objects[3].my_vehicle.x = -5
+        my_lane.reorder()
+        assert objects[3].leader_in_sight(my_lane) is objects[1]
 
 
 if __name__ == '__main__':
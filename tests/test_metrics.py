@@ -0,0 +1,59 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from checkpoint import dumps, loads
+from metrics import FIELDS
+from settings import Settings
+from simulation import Simulation
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestWindowMetrics(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        self.my_settings['simulation_timesteps'] = 550
+        self.my_settings['loglevel'] = 'WARNING'
+        self.my_settings['metrics_window'] = 20
+
+    def test_windows_add_up_to_the_run(self):
+        self.my_settings['metrics_file'] = os.path.join(self.directory.name, 'metrics.csv')
+        simulation = Simulation(self.my_settings)
+        result = simulation.run()
+        with open(self.my_settings['metrics_file']) as f:
+            rows = list(csv.DictReader(f))
+        lanes = len(simulation.lanes)
+        # 110 simulated seconds: five full windows and a partial one
+        assert len(rows) == 6 * lanes
+        assert tuple(rows[0]) == FIELDS
+        assert float(rows[-1]['window_end']) == 110.0
+        assert sum(int(row['vehicles_in']) for row in rows) == result.throughput
+        assert sum(int(row['vehicles_out']) for row in rows) == result.throughput_out
+        assert sum(int(row['crashed']) for row in rows) == len(set(simulation.final_crashed_ids))
+        assert any(float(row['density_per_km']) > 0 for row in rows)
+
+    def test_jsonl_and_resume(self):
+        self.my_settings['metrics_file'] = os.path.join(self.directory.name, 'straight.jsonl')
+        Simulation(self.my_settings).run()
+        with open(self.my_settings['metrics_file']) as f:
+            straight = [json.loads(line) for line in f]
+
+        self.my_settings['metrics_file'] = os.path.join(self.directory.name, 'resumed.jsonl')
+        simulation = Simulation(self.my_settings)
+        for _ in range(250):
+            simulation.step()
+        data = dumps(simulation)
+        for _ in range(150):
+            simulation.step()
+        loads(data).run()
+        with open(self.my_settings['metrics_file']) as f:
+            assert [json.loads(line) for line in f] == straight
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,5 +16,15 @@ class MyTestCase(unittest.TestCase):
         assert x == constants.WINDOW_WIDTH/2
         assert y == constants.WINDOW_HEIGHT/2
 
+    def test_worlds_do_not_share_state(self):
+        first = objects.GlobalObjectList()
+        first.add_road(Rd())
+        first.get_next_id()
+        second = objects.GlobalObjectList()
+        assert second.get_roads() == []
+        assert second.get_lanes() == []
+        assert second.get_next_id() == 1
+        assert second.get_light() is not first.get_light()
+
 if __name__ == '__main__':
     unittest.main()
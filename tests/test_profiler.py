@@ -0,0 +1,73 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+from checkpoint import dumps, loads
+from profiler import StepProfiler, NO_PROFILER
+from settings import Settings
+from simulation import Simulation
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestStepProfiler(unittest.TestCase):
+    def test_summary(self):
+        profiler = StepProfiler()
+        for _ in range(10):
+            with profiler.phase('a'):
+                pass
+        with profiler.phase('b'):
+            sum(range(10000))
+        profiler.count('pairs', 3)
+        profiler.count('pairs', 4)
+        summary = profiler.summary()
+        assert summary['phases']['a']['calls'] == 10
+        assert summary['phases']['b']['calls'] == 1
+        assert abs(sum(stats['share'] for stats in summary['phases'].values()) - 1) < 1e-9
+        assert summary['phases']['b']['p99'] <= summary['phases']['b']['max']
+        assert summary['counters'] == {'pairs': 7}
+        assert 'pairs: 7' in profiler.format()
+
+    def test_off_by_default(self):
+        my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        my_settings['loglevel'] = 'WARNING'
+        assert Simulation(my_settings).profiler is NO_PROFILER
+
+
+class TestSimulationProfile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        self.my_settings['simulation_timesteps'] = 200
+        self.my_settings['loglevel'] = 'WARNING'
+
+    def test_profile_file(self):
+        self.my_settings['profile'] = True
+        self.my_settings['profile_file'] = os.path.join(self.directory.name, 'profile.json')
+        self.my_settings['cprofile_file'] = os.path.join(self.directory.name, 'run.prof')
+        Simulation(self.my_settings).run()
+        with open(self.my_settings['profile_file']) as f:
+            summary = json.load(f)
+        for phase in ('generation', 'perception', 'planning', 'integration', 'crash_detection', 'end_detection'):
+            assert summary['phases'][phase]['calls'] == 200
+        assert summary['counters']['plan_pairs'] > 0
+        assert 'crash_candidate_pairs' in summary['counters']
+        assert pstats.Stats(self.my_settings['cprofile_file']).total_calls > 0
+
+    def test_profiling_does_not_change_the_run(self):
+        plain = Simulation(self.my_settings).run()
+        self.my_settings['profile'] = True
+        assert Simulation(self.my_settings).run() == plain
+
+    def test_checkpoint_keeps_timings(self):
+        self.my_settings['cprofile_file'] = os.path.join(self.directory.name, 'run.prof')
+        simulation = Simulation(self.my_settings)
+        for _ in range(50):
+            simulation.step()
+        resumed = loads(dumps(simulation))
+        simulation.close()
+        resumed.step()
+        assert resumed.profiler.summary()['phases']['planning']['calls'] == 51
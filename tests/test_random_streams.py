@@ -0,0 +1,29 @@
+import unittest
+
+from random_streams import RandomStreams, replication_seed
+
+
+class TestRandomStreams(unittest.TestCase):
+    def test_same_seed_same_numbers(self):
+        first, second = RandomStreams(3), RandomStreams(3)
+        assert first.lane_stream().random() == second.lane_stream().random()
+        assert list(first.should_plan_draws(5)) == list(second.should_plan_draws(5))
+
+    def test_lanes_get_independent_streams(self):
+        streams = RandomStreams(3)
+        assert streams.lane_stream().random() != streams.lane_stream().random()
+
+    def test_attentiveness_does_not_shift_the_lanes(self):
+        quiet, busy = RandomStreams(3), RandomStreams(3)
+        busy.should_plan_draws(1000)
+        assert quiet.lane_stream().random() == busy.lane_stream().random()
+
+    def test_replication_seeds(self):
+        assert RandomStreams(replication_seed(3, 0)).should_plan_draws(1)[0] == \
+            RandomStreams(replication_seed(3, 0)).should_plan_draws(1)[0]
+        assert RandomStreams(replication_seed(3, 0)).should_plan_draws(1)[0] != \
+            RandomStreams(replication_seed(3, 1)).should_plan_draws(1)[0]
+
+
+if __name__ == '__main__':
+    unittest.main()
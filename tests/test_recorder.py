@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from checkpoint import dumps, loads
+from recorder import TrajectoryRecorder, load_trajectories, step_rows, COLUMNS
+from settings import Settings
+from simulation import Simulation
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        self.my_settings['simulation_timesteps'] = 200
+        self.my_settings['loglevel'] = 'WARNING'
+
+    def record(self, name, **settings):
+        self.my_settings.update(settings, trajectory_directory=os.path.join(self.directory.name, name))
+        simulation = Simulation(self.my_settings)
+        simulation.recorder._resize(100)
+        simulation.run()
+        return simulation, load_trajectories(self.my_settings['trajectory_directory'])
+
+    def test_rows_match_the_world(self):
+        simulation, columns = self.record('plain')
+        assert set(columns) == set(COLUMNS)
+        assert len(columns['step']) == simulation.recorder.rows > 100
+        assert isinstance(columns['x'], np.memmap)
+        assert (np.diff(columns['step']) >= 0).all()
+        last = step_rows(columns, 199)
+        assert sorted(columns['object_id'][last]) == sorted(simulation.world)
+        for row in range(last.start, last.stop):
+            vehicle = simulation.world[int(columns['object_id'][row])].my_vehicle
+            assert (columns['x'][row], columns['y'][row], columns['speed'][row]) == (vehicle.x, vehicle.y, vehicle.speed)
+            assert columns['lane'][row] >= 0
+
+    def test_state_store_records_the_same_rows(self):
+        _, plain = self.record('plain')
+        _, stored = self.record('stored', state_store=True)
+        for name in COLUMNS:
+            assert np.array_equal(plain[name], stored[name]), name
+
+    def test_resume_rewrites_past_the_checkpoint(self):
+        _, straight = self.record('straight')
+        self.my_settings['trajectory_directory'] = os.path.join(self.directory.name, 'resumed')
+        simulation = Simulation(self.my_settings)
+        simulation.recorder._resize(100)
+        for _ in range(120):
+            simulation.step()
+        data = dumps(simulation)
+        for _ in range(40):
+            simulation.step()
+        simulation.close()
+        loads(data).run()
+        resumed = load_trajectories(self.my_settings['trajectory_directory'])
+        for name in COLUMNS:
+            assert np.array_equal(straight[name], resumed[name]), name
+
+    def test_empty_recording(self):
+        directory = os.path.join(self.directory.name, 'empty')
+        TrajectoryRecorder(directory, Simulation(self.my_settings).world).close()
+        assert len(load_trajectories(directory)['x']) == 0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+from replay import Replay
+from settings import Settings
+from simulation import Simulation
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def drawn(visuals):
+    return sorted((visual.color, tuple(visual.locations)) for visual in visuals)
+
+
+class TestReplay(unittest.TestCase):
+    def test_frames_match_the_live_run(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        my_settings['simulation_timesteps'] = 400
+        my_settings['loglevel'] = 'WARNING'
+        my_settings['trajectory_directory'] = directory.name
+        my_settings['intersection']['traffic_light']['cycle_time'] = 20
+        simulation = Simulation(my_settings)
+        live = {}
+        # the steps in which vehicles left the road
+        removals = []
+        while not simulation.finished():
+            # what the window shows once the step is done and finished vehicles are removed
+            step, throughput_out = simulation.loop, simulation.throughput_out
+            simulation.step()
+            live[step] = drawn(simulation.world.draw())
+            if simulation.throughput_out > throughput_out:
+                removals.append(step)
+        simulation.close()
+
+        replay = Replay(my_settings, directory.name)
+        assert replay.last_step == 399
+        assert drawn(replay.frame(399)) == live[399]
+        assert drawn(replay.frame(removals[0])) == live[removals[0]]
+        # seeking backwards replays the traffic light from the start
+        assert drawn(replay.frame(150)) == live[150]
+        assert drawn(replay.frame(399)) == live[399]
+
+
+if __name__ == '__main__':
+    unittest.main()
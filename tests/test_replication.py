@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from checkpoint import load_checkpoint
+import replication
+from replication import METRICS, RunningStat, t_quantile, run_replication, run_replications
+from settings import Settings
+from sweep import run_output_path
+from tracing import read_events, TraceEvent
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestReplication(unittest.TestCase):
+    def test_running_stat_matches_numpy(self):
+        values = np.random.default_rng(0).normal(5, 2, 50)
+        stat = RunningStat()
+        for value in values:
+            stat.add(value)
+        assert stat.count == 50
+        self.assertAlmostEqual(stat.mean, values.mean())
+        self.assertAlmostEqual(stat.variance, values.var(ddof=1))
+
+    def test_small_counts_need_an_absolute_precision(self):
+        # a crash in one replication out of ten: the mean is small but not zero
+        stat = RunningStat()
+        for value in [0, 0, 0, 1, 0, 0, 0, 0, 0, 0] * 20:
+            stat.add(value)
+        assert not stat.precise_enough(0.05)
+        assert stat.precise_enough(0.1, relative=False)
+        assert 'crashes' not in METRICS
+
+    def test_t_quantile(self):
+        self.assertAlmostEqual(t_quantile(0.975, 4), 2.776, places=2)
+        self.assertAlmostEqual(t_quantile(0.975, 10), 2.228, places=3)
+        self.assertAlmostEqual(t_quantile(0.995, 30), 2.750, places=3)
+        # the fewest degrees of freedom run_replications uses
+        self.assertAlmostEqual(t_quantile(0.975, 2), 4.303, places=1)
+
+    def test_stops_when_precise_and_is_reproducible(self):
+        my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        my_settings['simulation_timesteps'] = 50
+        my_settings['loglevel'] = 'WARNING'
+        # a loose absolute precision is met as soon as the minimum number of replications is in
+        rows, stats = run_replications(my_settings, precision=100, relative=False, metrics=('cars_in_per_second',),
+                                       min_replications=3, max_replications=20, workers=2)
+        assert [row['replication'] for row in rows] == [0, 1, 2]
+        assert stats['cars_in_per_second'].count == 3
+        again, _ = run_replications(my_settings, precision=100, relative=False, metrics=('cars_in_per_second',),
+                                    min_replications=3, max_replications=20, workers=3)
+        assert again == rows
+
+    def test_a_stopped_replication_gives_up(self):
+        my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        my_settings['loglevel'] = 'WARNING'
+        stop = multiprocessing.Event()
+        stop.set()
+        replication._set_stop(stop)
+        self.addCleanup(replication._set_stop, None)
+        assert run_replication((my_settings, 1, 0)) is None
+
+    def test_stops_at_max_replications(self):
+        my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        my_settings['simulation_timesteps'] = 20
+        my_settings['loglevel'] = 'WARNING'
+        rows, stats = run_replications(my_settings, precision=0.0, min_replications=3, max_replications=4, workers=2)
+        assert len(rows) == 4
+        with self.assertRaises(ValueError):
+            run_replications(my_settings, min_replications=2)
+
+    def test_every_replication_writes_its_own_trace(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        my_settings['simulation_timesteps'] = 50
+        my_settings['loglevel'] = 'WARNING'
+        my_settings['trace_file'] = os.path.join(directory.name, 'trace.bin')
+        rows, _ = run_replications(my_settings, precision=0.0, min_replications=3, max_replications=3, workers=3)
+        for row in rows:
+            events = list(read_events(run_output_path(my_settings['trace_file'], row['replication'])))
+            assert sum(event == TraceEvent.GENERATE for _, event, *_ in events) == row['throughput']
+        assert not os.path.exists(my_settings['trace_file'])
+
+    def test_every_replication_saves_its_own_checkpoint(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        my_settings['simulation_timesteps'] = 50
+        my_settings['loglevel'] = 'WARNING'
+        my_settings['checkpoint_every'] = 25
+        my_settings['checkpoint_file'] = os.path.join(directory.name, 'run.ckpt')
+        rows, _ = run_replications(my_settings, precision=0.0, min_replications=3, max_replications=3, workers=3)
+        for row in rows:
+            # the last checkpoint of a replication is its final state
+            resumed = load_checkpoint(run_output_path(my_settings['checkpoint_file'], row['replication']))
+            assert {**row, **resumed.result().as_row()} == row
+        assert not os.path.exists(my_settings['checkpoint_file'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from signal import TrafficLight, TrafficHead, TrafficLightColor
+
+TIMESTEP = 0.2
+
+
+class TestTrafficLight(unittest.TestCase):
+    def run_light(self, light, head, start_step, end_step) -> list[float]:
+        """ Update the light every timestep and return the times the head turned red or green """
+        changes = []
+        for step in range(start_step, end_step):
+            the_time = step * TIMESTEP
+            before = head.color
+            light.update(the_time)
+            if head.color != before and head.color != TrafficLightColor.YELLOW:
+                changes.append(round(the_time, 1))
+        return changes
+
+    def test_shortening_the_cycle_mid_phase_changes_once(self):
+        head = TrafficHead(0, None, TrafficLightColor.GREEN)
+        light = TrafficLight(cycle_time=60, yellow_time=3, traffic_heads=[head])
+        assert self.run_light(light, head, 0, 500) == [60.0]
+        # 20 seconds into a 60 second phase, cut the cycle to 10
+        light.retime(10, 3, the_time=100)
+        assert self.run_light(light, head, 500, 550) == [100.0]
+        assert self.run_light(light, head, 550, 560) == [110.0]
+
+    def test_lengthening_the_cycle_stretches_the_phase(self):
+        head = TrafficHead(0, None, TrafficLightColor.GREEN)
+        light = TrafficLight(cycle_time=60, yellow_time=3, traffic_heads=[head])
+        assert self.run_light(light, head, 0, 500) == [60.0]
+        light.retime(90, 3, the_time=100)
+        assert self.run_light(light, head, 500, 1000) == [150.0]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import copy
+import os
+import unittest
+
+from settings import Settings
+from checkpoint import dumps, loads
+from simulation import Simulation, run_many
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestSimulation(unittest.TestCase):
+    def setUp(self):
+        self.my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        self.my_settings['simulation_timesteps'] = 100
+        self.my_settings['loglevel'] = 'WARNING'
+
+    def seeded_run(self, seed):
+        self.my_settings['seed'] = seed
+        return Simulation(self.my_settings).run()
+
+    def test_back_to_back_runs_are_isolated(self):
+        first = self.seeded_run(5)
+        second = self.seeded_run(5)
+        assert first.throughput > 0
+        assert first == second
+
+    def test_seed_changes_the_run(self):
+        assert self.seeded_run(5) != self.seeded_run(6)
+
+    def test_run_many(self):
+        results = run_many([self.my_settings] * 3)
+        assert len(results) == 3
+        assert all(result.throughput > 0 for result in results)
+
+    def test_update_settings(self):
+        simulation = Simulation(self.my_settings)
+        for _ in range(50):
+            simulation.step()
+        changed = copy.deepcopy(dict(self.my_settings))
+        changed['intersection']['traffic_light']['cycle_time'] = 30
+        changed['roads'][0]['lanes'][0]['generator']['flow'] = 4
+        changed['simulation_timesteps'] = 80
+        light = simulation.world.get_light()
+        next_change = light._next_change
+        simulation.update_settings(changed)
+        assert light.cycle_time == 30
+        assert light._next_change == next_change - 30
+        assert simulation.lanes[0].generator._flow == 4
+        assert simulation.run().throughput > 0
+        assert simulation.loop == 80
+
+        changed = copy.deepcopy(dict(self.my_settings))
+        changed['roads'][0]['lanes'][0]['width'] = 1
+        with self.assertRaises(ValueError):
+            simulation.update_settings(changed)
+
+    def test_warm_copy_with_the_same_settings_continues_the_run(self):
+        simulation = Simulation(self.my_settings)
+        for _ in range(50):
+            simulation.step()
+        warm = dumps(simulation)
+        expected = simulation.run()
+        copied = loads(warm)
+        copied.update_settings(copy.deepcopy(dict(self.my_settings)))
+        assert copied.run() == expected
+
+    def test_arrivals_are_the_lanes_a_poll_would_find_due(self):
+        simulation = Simulation(self.my_settings)
+        scheduler = simulation.arrivals
+        for _ in range(100):
+            the_time = simulation.the_time
+            due = scheduler.due(the_time)
+            assert due == [lane for lane in simulation.lanes if lane.generator.next_generation_time <= the_time]
+            for lane in due:
+                scheduler.schedule(lane)
+            simulation.step()
+        assert len(scheduler._heap) == len(simulation.lanes)
+
+    def test_finished_drivers_are_reused_but_crashed_ones_are_not(self):
+        self.my_settings['simulation_timesteps'] = 1000
+        simulation = Simulation(self.my_settings)
+        drivers = {}
+        while not simulation.finished():
+            if simulation.loop == 300:
+                # put the back driver of a lane on top of the one ahead of it, so the two crash
+                lane = next(lane for lane in simulation.lanes if len(lane.get_objects()) >= 2)
+                ahead, back = lane.get_objects()[-2:]
+                back.my_vehicle.x, back.my_vehicle.y = ahead.my_vehicle.x, ahead.my_vehicle.y
+            simulation.step()
+            for driver in simulation.world.values():
+                drivers.setdefault(driver.object_id, driver)
+        result = simulation.result()
+        assert result.throughput_out > 0
+        assert simulation.final_crashed
+        # several object ids were given to the same recycled driver
+        assert len({id(driver) for driver in drivers.values()}) < len(drivers)
+        recycled = {id(driver) for driver in simulation.world._recycled}
+        assert not any(id(driver) in recycled for driver in simulation.final_crashed)
+        assert [driver.object_id for driver in simulation.final_crashed] == simulation.final_crashed_ids
+
+    def test_drivers_only_look_at_crossing_traffic(self):
+        for scenario in ('high_flow_with_light', 'high_flow_without_light'):
+            with self.subTest(scenario=scenario):
+                my_settings = Settings(os.path.join(REPO_ROOT, f'simulation_settings_{scenario}.yaml'))
+                my_settings['loglevel'] = 'WARNING'
+                my_settings['seed'] = 1
+                simulation = Simulation(my_settings)
+                for _ in range(300):
+                    simulation.step()
+                simulation._index_traffic()
+                light, world = simulation.world.get_light(), simulation.world
+                seen_by = {driver: simulation._crossing_traffic(driver, world.get_lane_of(driver.object_id))
+                           for driver in world.values()}
+                for driver, seen in seen_by.items():
+                    crossing = [] if light.controls(world.get_lane_of(driver.object_id)) else \
+                        [other for other in driver.look(world) if driver._check_whether_perpendicular(other)]
+                    assert seen == crossing
+                if scenario.endswith('without_light'):
+                    assert any(seen_by.values())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import random
+import unittest
+
+from driver import Driver, Quality
+from objects import GlobalObjectList
+from spatial_index import SpatialGrid
+from vehicle import Vehicle
+
+
+class TestSpatialGrid(unittest.TestCase):
+    def test_look_with_index_matches_full_scan(self):
+        rng = random.Random(7)
+        object_list = GlobalObjectList()
+        for object_id in range(150):
+            vehicle = Vehicle(x=rng.uniform(-500, 500), y=rng.choice([-2.5, 2.5, rng.uniform(-500, 500)]),
+                              length=rng.uniform(0.2, 15), speed=0, acceleration=0, max_speed=10,
+                              max_acceleration=5, max_angle=45, angle=rng.choice([0, 90, 180, 270]))
+            object_list[object_id] = Driver(object_id, vehicle, 60, (0, 0), Quality())
+        index = SpatialGrid(60).rebuild(object_list.values())
+        for driver in object_list.values():
+            assert driver.look(object_list, index) == driver.look(object_list)
+
+    def test_near_excludes_self_and_far_drivers(self):
+        me = Driver(0, Vehicle(0, 0, 1, 0, 0, 1, 1, 1), 10, (0, 0), Quality())
+        close = Driver(1, Vehicle(5, 0, 1, 0, 0, 1, 1, 1), 10, (0, 0), Quality())
+        far = Driver(2, Vehicle(500, 0, 1, 0, 0, 1, 1, 1), 10, (0, 0), Quality())
+        index = SpatialGrid(10).rebuild([me, close, far])
+        assert index.near(me, 10) == [close]
+
+
+if __name__ == '__main__':
+    unittest.main()
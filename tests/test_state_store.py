@@ -0,0 +1,62 @@
+import unittest
+
+from state_store import VehicleStateStore, StoredVehicle
+from vehicle import Vehicle
+
+
+def make_vehicles(store, **kwargs):
+    plain = Vehicle(**kwargs)
+    stored = StoredVehicle(store, **kwargs)
+    return plain, stored
+
+
+class TestVehicleStateStore(unittest.TestCase):
+    def test_update_matches_vehicle_update(self):
+        store = VehicleStateStore(capacity=1)
+        pairs = [
+            make_vehicles(store, x=0, y=0, length=1, speed=1, acceleration=1, max_speed=10, max_acceleration=10,
+                          max_angle=90, angle=0, width=1),
+            make_vehicles(store, x=3, y=-2, length=4, speed=1, acceleration=-2, max_speed=10, max_acceleration=10,
+                          max_angle=90, angle=90, width=2),
+            make_vehicles(store, x=5, y=7, length=2, speed=9.5, acceleration=3, max_speed=10, max_acceleration=10,
+                          max_angle=90, angle=270, width=1),
+        ]
+        for _ in range(5):
+            store.update(0.2)
+            for plain, _stored in pairs:
+                plain.update(0.2)
+        for plain, stored in pairs:
+            assert (stored.x, stored.y, stored.speed) == (plain.x, plain.y, plain.speed)
+            assert stored.average_speed() == plain.average_speed()
+            assert stored.get_rear() == plain.get_rear()
+
+    def test_update_rejects_negative_speed(self):
+        store = VehicleStateStore()
+        StoredVehicle(store, x=0, y=0, length=1, speed=-1, acceleration=0, max_speed=10, max_acceleration=10,
+                      max_angle=90)
+        with self.assertRaises(ValueError):
+            store.update(1)
+
+    def test_released_slots_are_reused(self):
+        store = VehicleStateStore(capacity=2)
+        first = StoredVehicle(store, x=1, y=2, length=1, speed=3, acceleration=0, max_speed=10, max_acceleration=10,
+                              max_angle=90)
+        first_slot = first._slot
+        first.release()
+        assert len(store) == 0
+        second = StoredVehicle(store, x=0, y=0, length=1, speed=0, acceleration=0, max_speed=10,
+                               max_acceleration=10, max_angle=90)
+        assert second._slot == first_slot
+        # the released vehicle keeps its final state
+        assert (first.x, first.y, first.speed) == (1, 2, 3)
+
+    def test_store_grows(self):
+        store = VehicleStateStore(capacity=1)
+        vehicles = [StoredVehicle(store, x=i, y=0, length=1, speed=0, acceleration=0, max_speed=10,
+                                  max_acceleration=10, max_angle=90) for i in range(5)]
+        assert len(store) == 5
+        assert [v.x for v in vehicles] == [0, 1, 2, 3, 4]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import csv
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from unittest import mock
+
+from checkpoint import loads
+from metrics import FIELDS
+from random_streams import replication_seed
+from recorder import load_trajectories
+from settings import Settings
+from sweep import set_path, expand_grid, apply_overrides, run_sweep, run_output_path, warm_up
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestSweep(unittest.TestCase):
+    def test_set_path_with_index_and_wildcard(self):
+        my_settings = {'roads': [{'lanes': [{'width': 1}, {'width': 2}]}, {'lanes': [{'width': 3}]}]}
+        set_path(my_settings, 'roads.0.lanes.1.width', 9)
+        assert my_settings['roads'][0]['lanes'][1]['width'] == 9
+        set_path(my_settings, 'roads.*.lanes.*.width', 5)
+        assert [lane['width'] for road in my_settings['roads'] for lane in road['lanes']] == [5, 5, 5]
+        with self.assertRaises(KeyError):
+            set_path(my_settings, 'roads.0.speed', 5)
+
+    def test_expand_grid(self):
+        combinations = expand_grid({'a': [1, 2], 'b.c': ['x', 'y', 'z']})
+        assert len(combinations) == 6
+        assert combinations[0] == {'a': 1, 'b.c': 'x'}
+
+    def test_apply_overrides_leaves_base_untouched(self):
+        base = {'intersection': {'traffic_light': {'cycle_time': 60}}}
+        changed = apply_overrides(base, {'intersection.traffic_light.cycle_time': 30})
+        assert changed['intersection']['traffic_light']['cycle_time'] == 30
+        assert base['intersection']['traffic_light']['cycle_time'] == 60
+
+    def test_run_sweep(self):
+        base = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        base['simulation_timesteps'] = 50
+        base['loglevel'] = 'WARNING'
+        rows = run_sweep(base, {'intersection.traffic_light.cycle_time': [10, 20]}, workers=2, replications=2)
+        assert [(row['combination'], row['replication']) for row in rows] == [(0, 0), (0, 1), (1, 0), (1, 1)]
+        assert [row['intersection.traffic_light.cycle_time'] for row in rows] == [10, 10, 20, 20]
+        assert all(row['throughput'] > 0 for row in rows)
+
+    def test_run_sweep_from_a_warm_start(self):
+        base = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        base['simulation_timesteps'] = 80
+        base['loglevel'] = 'WARNING'
+        grid = {'intersection.traffic_light.cycle_time': [10, 20]}
+        with mock.patch('sweep.warm_up', wraps=warm_up) as counted_warm_up:
+            rows = run_sweep(base, grid, workers=2, replications=2, warmup_steps=50)
+        assert counted_warm_up.call_count == 1
+        assert [row['intersection.traffic_light.cycle_time'] for row in rows] == [10, 10, 20, 20]
+        cold_rows = run_sweep(base, grid, workers=2, replications=2)
+        assert all(row != cold_row for row, cold_row in zip(rows, cold_rows))
+        # every run carries on from the same warmed-up world
+        simulation = loads(warm_up(base, 50))
+        my_settings = apply_overrides(base, {'intersection.traffic_light.cycle_time': 20})
+        my_settings['seed'] = replication_seed(base['seed'], 1)
+        simulation.update_settings(my_settings)
+        assert {**rows[3], **simulation.run().as_row()} == rows[3]
+
+    def test_run_output_path(self):
+        assert run_output_path('/tmp/m.csv', 1, 2) == '/tmp/m.c2.r1.csv'
+        assert run_output_path('/tmp/trajectories/', 3) == '/tmp/trajectories.r3'
+
+    def test_every_run_writes_its_own_metrics(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        base = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        base['simulation_timesteps'] = 150
+        base['loglevel'] = 'WARNING'
+        base['metrics_window'] = 10
+        base['metrics_file'] = os.path.join(directory.name, 'metrics.csv')
+        lanes = sum(len(road['lanes']) for road in base['roads'])
+        for warmup_steps, windows in ((0, 3), (50, 2)):
+            rows = run_sweep(base, {'intersection.traffic_light.cycle_time': [10, 20]}, workers=4, replications=2,
+                             warmup_steps=warmup_steps)
+            for row in rows:
+                with open(run_output_path(base['metrics_file'], row['replication'], row['combination'])) as f:
+                    metrics = list(csv.DictReader(f))
+                assert len(metrics) == windows * lanes
+                assert all(tuple(window) == FIELDS and None not in window.values() for window in metrics)
+                # the runs carried on from the warm-up start their first window where it ended
+                assert float(metrics[0]['window_start']) == warmup_steps * base['timestep']
+                if not warmup_steps:
+                    assert sum(int(window['vehicles_in']) for window in metrics) == row['throughput']
+            assert not os.path.exists(base['metrics_file'])
+
+    def test_every_run_records_its_own_trajectories(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        base = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        base['simulation_timesteps'] = 150
+        base['loglevel'] = 'WARNING'
+        base['trajectory_directory'] = os.path.join(directory.name, 'trajectories')
+        rows = run_sweep(base, {'intersection.traffic_light.cycle_time': [10, 20]}, workers=4, replications=2,
+                         warmup_steps=50)
+        recordings = []
+        for row in rows:
+            columns = load_trajectories(run_output_path(base['trajectory_directory'], row['replication'],
+                                                        row['combination']))
+            # only the steps after the warm-up, each recorded once
+            assert (columns['step'][0], columns['step'][-1]) == (50, 149)
+            assert all(columns['step'][1:] >= columns['step'][:-1])
+            recordings.append(columns['x'].tobytes())
+        assert len(set(recordings)) == len(rows)
+        assert not os.path.exists(base['trajectory_directory'])
+
+    def test_every_run_saves_its_own_profile(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        base = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        base['simulation_timesteps'] = 80
+        base['loglevel'] = 'WARNING'
+        base['profile_file'] = os.path.join(directory.name, 'profile.json')
+        base['cprofile_file'] = os.path.join(directory.name, 'run.prof')
+        rows = run_sweep(base, {'intersection.traffic_light.cycle_time': [10, 20]}, workers=2, warmup_steps=50)
+        for row in rows:
+            with open(run_output_path(base['profile_file'], row['replication'], row['combination'])) as f:
+                summary = json.load(f)
+            # the steps of this run, not those of the warm-up
+            assert summary['phases']['planning']['calls'] == 30
+            assert pstats.Stats(run_output_path(base['cprofile_file'], row['replication'],
+                                                row['combination'])).total_calls > 0
+        assert not os.path.exists(base['profile_file'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import logging
+import os
+import tempfile
+import threading
+import unittest
+
+from settings import Settings
+from simulation import Simulation
+from tracing import Trace, TraceEvent, BinaryEventSink, read_events
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.addCleanup(logging.getLogger().setLevel, logging.getLogger().level)
+
+    def test_every_thread_has_its_own_flags(self):
+        trace = Trace()
+        trace.set_level(logging.DEBUG)
+        other_thread = []
+        thread = threading.Thread(target=lambda: other_thread.append((trace.debug, trace.info)))
+        thread.start()
+        thread.join()
+        assert trace.debug and trace.info
+        assert other_thread == [(False, False)]
+        trace.set_level(logging.INFO)
+        assert trace.info and not trace.debug
+
+    def test_simulations_in_threads_log_at_their_own_level(self):
+        root_level = logging.getLogger().level
+        simulations = {}
+        for level in ('DEBUG', 'WARNING'):
+            my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+            my_settings['simulation_timesteps'] = 50
+            my_settings['loglevel'] = level
+            simulations[level] = Simulation(my_settings)
+        with self.assertLogs(level=logging.DEBUG) as logs:
+            threads = [threading.Thread(target=simulation.run, name=level) for level, simulation in simulations.items()]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert logging.getLogger().level == root_level
+        assert {record.threadName for record in logs.records if record.levelno < logging.WARNING} == {'DEBUG'}
+
+    def test_sink_round_trip(self):
+        file_name = os.path.join(self.directory.name, 'trace.bin')
+        sink = BinaryEventSink(file_name, buffer_records=2)
+        sink.write(0, TraceEvent.GENERATE, 1, 1.5, -2.0, 10.0)
+        sink.write(3, TraceEvent.PLAN, 1, 2.0, -2.0, -0.5)
+        sink.write(7, TraceEvent.REMOVE, 1)
+        sink.close()
+        assert os.path.getsize(file_name) == 3 * BinaryEventSink.RECORD.size
+        events = list(read_events(file_name))
+        assert events[0] == (0, TraceEvent.GENERATE, 1, 1.5, -2.0, 10.0)
+        assert events[1][1] is TraceEvent.PLAN
+        assert events[2] == (7, TraceEvent.REMOVE, 1, 0.0, 0.0, 0.0)
+
+    def test_simulation_writes_events(self):
+        my_settings = Settings(os.path.join(REPO_ROOT, 'simulation_settings_demo.yaml'))
+        my_settings['simulation_timesteps'] = 100
+        my_settings['loglevel'] = 'WARNING'
+        my_settings['trace_file'] = os.path.join(self.directory.name, 'run.bin')
+        result = Simulation(my_settings).run()
+        events = list(read_events(my_settings['trace_file']))
+        generated = [event for event in events if event[1] is TraceEvent.GENERATE]
+        assert len(generated) == result.throughput
+        assert any(event[1] is TraceEvent.PLAN for event in events)
+
+
+if __name__ == '__main__':
+    unittest.main()
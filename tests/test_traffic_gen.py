@@ -1,5 +1,15 @@
+import copy
 import unittest
-from generator import Generator
+
+import numpy as np
+
+from constants import LaneDirection
+from generator import Generator, SAMPLE_BLOCK
+from objects import GlobalObjectList
+
+GENERATOR_SETTINGS = {'flow': 0.5,
+                      'vehicle_distribution': {'car': 0.5, 'truck': 0.5},
+                      'attentiveness': {'average': 0.9, 'width': 0.5}}
 
 
 class MyTestCase(unittest.TestCase):
@@ -10,5 +20,35 @@ class MyTestCase(unittest.TestCase):
         assert Generator(10, 90).should_generate() == True
 
 
+class TestPresampling(unittest.TestCase):
+    def generator(self, seed=1):
+        return Generator(GlobalObjectList(), copy.deepcopy(GENERATOR_SETTINGS), LaneDirection.FORWARD,
+                         rng=np.random.default_rng(seed))
+
+    def test_samples_are_clamped_and_refilled(self):
+        generator = self.generator()
+        qualities = [generator._next_quality() for _ in range(SAMPLE_BLOCK * 2 + 1)]
+        assert all(0.1 <= attentiveness <= 1.0 and 0.75 <= speeding <= 1.25 and 0.6 <= following <= 1.4
+                   for attentiveness, speeding, following in qualities)
+        assert len(set(qualities)) == len(qualities)
+        assert {generator.pick_vehicle_type().__name__ for _ in range(100)} == {'Car', 'Truck'}
+
+    def test_same_seed_same_samples(self):
+        first, second = self.generator(), self.generator()
+        assert first.next_generation_time == second.next_generation_time
+        assert [first._next_quality() for _ in range(10)] == [second._next_quality() for _ in range(10)]
+
+    def test_update_settings_only_drops_changed_samples(self):
+        generator = self.generator()
+        generator._next_quality()
+        generator.pick_vehicle_type()
+        gaps, types = list(generator._arrival_gaps), list(generator._vehicle_types)
+        changed = copy.deepcopy(GENERATOR_SETTINGS)
+        changed['attentiveness']['average'] = 0.5
+        generator.update_settings(changed)
+        assert generator._arrival_gaps == gaps and generator._vehicle_types == types
+        assert generator._qualities == []
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+from math import cos, sin, radians
+
+from utils import heading_of, cos_degrees, sin_degrees, split_vector
+
+
+class TestHeading(unittest.TestCase):
+    def test_cardinal_headings_are_exact(self):
+        assert (heading_of(0).dx, heading_of(0).dy) == (1, 0)
+        assert (heading_of(90).dx, heading_of(90).dy) == (0, 1)
+        assert (heading_of(180).dx, heading_of(180).dy) == (-1, 0)
+        assert (heading_of(270).dx, heading_of(270).dy) == (0, -1)
+
+    def test_headings_are_shared_and_match_rounded_trig(self):
+        assert heading_of(30) is heading_of(30.0)
+        for angle in (0, 30, 45, 90, 135, 200, 270, 359.5):
+            assert cos_degrees(angle) == round(cos(radians(angle)), 3)
+            assert sin_degrees(angle) == round(sin(radians(angle)), 3)
+
+    def test_split_vector(self):
+        assert split_vector(2, 90) == (0, 2)
+        assert split_vector(2, 180) == (-2, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
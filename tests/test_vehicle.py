@@ -1,3 +1,4 @@
+import pickle
 import unittest
 from vehicle import Vehicle
 
@@ -103,6 +104,16 @@ class TestVehicle(unittest.TestCase):
         print(back)
         assert back == (0, 3)
 
+    def test_vehicles_share_their_type(self):
+        first = Vehicle(x=0, y=0, length=5, speed=0, acceleration=0, max_speed=10, max_acceleration=8, max_angle=45)
+        second = Vehicle(x=9, y=9, length=5, speed=3, acceleration=1, max_speed=10, max_acceleration=8, max_angle=45)
+        assert first.vehicle_type is second.vehicle_type
+        assert not hasattr(first, '__dict__')
+        assert pickle.loads(pickle.dumps(first)).vehicle_type is first.vehicle_type
+        second.length = 6
+        assert (first.length, second.length) == (5, 6)
+        assert second.vehicle_type.max_speed == 10
+
 
 if __name__ == '__main__':
     unittest.main()
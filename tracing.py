@@ -0,0 +1,91 @@
+""" Structured tracing for the simulator.
+
+Log calls on the hot path are guarded by the flags on `trace`, e.g.
+
+    if trace.debug:
+        logging.debug(f"...")
+
+so a disabled level costs one attribute lookup instead of formatting the message. Simulation.step sets the flags
+from its loglevel setting once per step (set_level()). Every thread has its own flags, so simulations stepping in
+different threads each log at their own level; the root logger still decides which messages are shown.
+
+With tracing on, a BinaryEventSink records one fixed-size record per event instead of a formatted line.
+"""
+import logging
+import struct
+import threading
+from enum import IntEnum
+
+
+def log_level(level) -> int:
+    """ The number of a log level given by name (e.g. 'INFO') or number """
+    return level if isinstance(level, int) else logging.getLevelName(level)
+
+
+class Trace(threading.local):
+    """ Which log levels the simulation stepping in this thread logs at, so hot code does not ask on every call """
+
+    def __init__(self):
+        self.debug = False
+        self.info = False
+
+    def set_level(self, level: int):
+        self.debug = level <= logging.DEBUG
+        self.info = level <= logging.INFO
+
+
+# shared by every module that logs on the hot path, with separate flags in every thread
+trace = Trace()
+
+
+class TraceEvent(IntEnum):
+    GENERATE = 1
+    PLAN = 2
+    CRASH = 3
+    REMOVE = 4
+
+
+class BinaryEventSink:
+    """ Appends fixed-size little-endian records to a file:
+    step (uint32), event (uint8), object id (uint32), x, y, value (float64).
+    value is the speed for GENERATE and CRASH, the acceleration change for PLAN and the average speed for REMOVE.
+    Records are buffered and written in blocks.
+    """
+    RECORD = struct.Struct('<IBIddd')
+
+    def __init__(self, file_name: str, buffer_records: int = 4096, keep_records: int = 0):
+        """ keep_records continues an existing file after its first keep_records records, dropping the rest """
+        self.file_name = file_name
+        if keep_records:
+            self._file = open(file_name, 'r+b')
+            self._file.truncate(keep_records * self.RECORD.size)
+            self._file.seek(0, 2)
+        else:
+            self._file = open(file_name, 'wb')
+        self._buffer = bytearray()
+        self._buffer_bytes = buffer_records * self.RECORD.size
+        self.count = keep_records
+
+    def write(self, step: int, event: TraceEvent, object_id: int, x: float = 0.0, y: float = 0.0,
+              value: float = 0.0):
+        self._buffer += self.RECORD.pack(step, event, object_id, x, y, value)
+        self.count += 1
+        if len(self._buffer) >= self._buffer_bytes:
+            self.flush()
+
+    def flush(self):
+        self._file.write(self._buffer)
+        self._buffer.clear()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def read_events(file_name: str):
+    """ Yield (step, event, object_id, x, y, value) for every record in a file written by BinaryEventSink """
+    with open(file_name, 'rb') as f:
+        data = f.read()
+    for step, event, object_id, x, y, value in BinaryEventSink.RECORD.iter_unpack(data):
+        yield step, TraceEvent(event), object_id, x, y, value
@@ -11,12 +11,44 @@ def cal_distance(z):
     return sqrt(a * a + b * b)
 
 
+class Heading:
+    """ A direction in degrees with its unit vector, rounded to ROUNDING digits.
+    Get instances from heading_of(), which shares one per angle.
+    """
+    __slots__ = ('angle', 'dx', 'dy')
+
+    def __init__(self, angle: float):
+        self.angle = angle
+        self.dx = round(cos(radians(angle)), ROUNDING)
+        self.dy = round(sin(radians(angle)), ROUNDING)
+
+    def __repr__(self):
+        return f'Heading: angle={self.angle} dx={self.dx} dy={self.dy}'
+
+
+_HEADINGS: dict[float, Heading] = {}
+
+
+def heading_of(angle: float) -> Heading:
+    """ Return the shared Heading for an angle, computing its unit vector the first time the angle is seen """
+    try:
+        return _HEADINGS[angle]
+    except KeyError:
+        heading = _HEADINGS[angle] = Heading(angle)
+        return heading
+
+
+# every road in the simulator is at a multiple of 90 degrees, so these are all that is normally needed
+for _angle in (0, 90, 180, 270, 360, 450):
+    heading_of(_angle)
+
+
 def cos_degrees(d: float) -> float:
-    return round(cos(radians(d)), ROUNDING)
+    return heading_of(d).dx
 
 
 def sin_degrees(d: float) -> float:
-    return round(sin(radians(d)), ROUNDING)
+    return heading_of(d).dy
 
 
 def quadratic_equation(a, b, c) -> set:
@@ -46,8 +78,9 @@ def intervals_overlap(a0, a1, b0, b1, buffer=0.0) -> bool:
 
 
 def split_vector(magnitude, angle) -> tuple[float, float]:
-    x = cos_degrees(angle) * magnitude
-    y = sin_degrees(angle) * magnitude
+    heading = heading_of(angle)
+    x = heading.dx * magnitude
+    y = heading.dy * magnitude
     return x, y
 
 
@@ -1,11 +1,12 @@
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from time import sleep
 from enum import Enum
 from math import sin, cos, radians, fabs
+from operator import attrgetter
 from settings import Settings
 import constants
-from utils import quadratic_equation, cal_distance, cos_degrees, sin_degrees, cal_length_compared_to_screen
+from utils import quadratic_equation, cal_distance, cal_length_compared_to_screen, heading_of, Heading
 
 
 class Direction(Enum):
@@ -15,7 +16,55 @@ class Direction(Enum):
     RIGHT = 1
 
 
+@dataclass(frozen=True, slots=True)
+class VehicleType:
+    """ The constants of one kind of vehicle. Vehicles share one record per kind instead of each holding a copy. """
+    length: float
+    width: float
+    max_speed: float
+    max_acceleration: float
+    max_angle: float
+
+    def __reduce__(self):
+        # intern again on unpickling, so a resumed checkpoint still shares one record per kind
+        return vehicle_type, (self.length, self.width, self.max_speed, self.max_acceleration, self.max_angle)
+
+
+_vehicle_types: dict[tuple, VehicleType] = {}
+# the record of a vehicle whose __init__ never ran (e.g. a test double) until its constants are set one by one
+_NO_TYPE = VehicleType(None, None, None, None, None)
+
+
+def vehicle_type(length: float, width: float, max_speed: float, max_acceleration: float,
+                 max_angle: float) -> VehicleType:
+    """ Return the shared record with these constants """
+    key = (length, width, max_speed, max_acceleration, max_angle)
+    record = _vehicle_types.get(key)
+    if record is None:
+        record = _vehicle_types[key] = VehicleType(*key)
+    return record
+
+
+def _type_constant(name: str) -> property:
+    def fset(self, value):
+        # switch to the record that differs only in this constant
+        record = replace(getattr(self, 'vehicle_type', _NO_TYPE), **{name: value})
+        self.vehicle_type = vehicle_type(record.length, record.width, record.max_speed, record.max_acceleration,
+                                         record.max_angle)
+
+    # attrgetter reads through the record in C, as fast as reading a slot
+    return property(attrgetter(f'vehicle_type.{name}'), fset)
+
+
 class Vehicle:
+    __slots__ = ('x', 'y', 'speed', 'acceleration', 'vehicle_type', 'turn_signal', 'angle', 'my_time',
+                 'my_distance')
+    length = _type_constant('length')
+    width = _type_constant('width')
+    max_speed = _type_constant('max_speed')
+    max_acceleration = _type_constant('max_acceleration')
+    max_angle = _type_constant('max_angle')
+
     def __init__(self, x: float,
                  y: float,
                  length: float,
@@ -26,18 +75,26 @@ class Vehicle:
                  max_angle: float,
                  angle: float = 0,
                  width: float = 1):
-
+        self.reset(x, y, length, speed, acceleration, max_speed, max_acceleration, max_angle, angle, width)
+
+    def reset(self, x: float,
+              y: float,
+              length: float,
+              speed: float,
+              acceleration: float,
+              max_speed: float,
+              max_acceleration: float,
+              max_angle: float,
+              angle: float = 0,
+              width: float = 1):
+        """ Set every field as a new vehicle, e.g. when a recycled vehicle is reused """
+        self.vehicle_type = vehicle_type(length, width, max_speed, max_acceleration, max_angle)
         self.x = x
         self.y = y
-        self.length = length
         self.speed = min(speed, max_speed)
         self.acceleration = min(acceleration, max_acceleration)
-        self.max_speed = max_speed
-        self.max_acceleration = max_acceleration
-        self.max_angle = max_angle
         self.turn_signal: Direction = Direction.OFF
         self.angle = angle  # direction you are facing
-        self.width = width
         self.my_time = 0
         self.my_distance = 0
 
@@ -50,10 +107,11 @@ class Vehicle:
         if self.acceleration < 0:
             time_to_stop = -self.speed/self.acceleration
             timestep = min(time_to_stop, timestep)
-        speed_x = cos_degrees(self.angle)*self.speed
-        speed_y = sin_degrees(self.angle)*self.speed
-        acceleration_x = cos_degrees(self.angle)*self.acceleration
-        acceleration_y = sin_degrees(self.angle)*self.acceleration
+        heading = self.heading
+        speed_x = heading.dx*self.speed
+        speed_y = heading.dy*self.speed
+        acceleration_x = heading.dx*self.acceleration
+        acceleration_y = heading.dy*self.acceleration
         new_x = speed_x * timestep + 0.5 * acceleration_x * timestep * timestep + self.x
         new_y = speed_y * timestep + 0.5 * acceleration_y * timestep * timestep + self.y
         return new_x, new_y
@@ -83,6 +141,12 @@ class Vehicle:
         self.acceleration = max(-self.max_acceleration, self.acceleration)
         self.acceleration = round(self.acceleration, constants.ROUNDING)
 
+    def release(self, keep_state: bool = True):
+        """ Called when the vehicle leaves the simulation. keep_state=False when it is recycled and its final state
+        is not needed. Plain vehicles hold nothing to give back.
+        """
+        pass
+
     def signal(self, direction: Direction):
         """ Changes direction of turn signal """
         self.turn_signal = direction
@@ -91,10 +155,15 @@ class Vehicle:
     def get_settings(cls, global_settings: Settings):
         return global_settings['vehicles'][cls.__name__.lower()]
 
+    @property
+    def heading(self) -> Heading:
+        """ The direction the vehicle is facing, with its cached unit vector """
+        return heading_of(self.angle)
+
     def get_rear(self) -> tuple[float, float]:
-        back_angle = self.angle+180
-        xl = self.x + self.length*cos_degrees(back_angle)
-        yl = self.y + self.length*sin_degrees(back_angle)
+        back = heading_of(self.angle+180)
+        xl = self.x + self.length*back.dx
+        yl = self.y + self.length*back.dy
         return xl, yl
 
     def steer(self, angle: float):
@@ -118,30 +187,40 @@ class Vehicle:
         length = cal_length_compared_to_screen((NotImplemented, NotImplemented), self.length)
 
 class Pedestrian(Vehicle):
+    __slots__ = ()
+
     def __init__(self, x: float, y: float, speed: float, acceleration: float, max_speed: float = 3, length: float = 0.3,
                  max_acceleration: float = 8, max_angle: float = 360, angle: float = 0):
         super().__init__(x, y, length, speed, acceleration, max_speed, max_acceleration, max_angle, angle)
 
 
 class Bicycle(Vehicle):
+    __slots__ = ()
+
     def __init__(self, x: float, y: float, speed: float, acceleration: float, max_speed: float = 13, length: float = 3,
                  max_acceleration: float = 5, max_angle: float = 270, angle: float = 0):
         super().__init__(x, y, length, speed, acceleration, max_speed, max_acceleration, max_angle, angle)
 
 
 class Truck(Vehicle):
+    __slots__ = ()
+
     def __init__(self, x: float, y: float, speed: float, acceleration: float, max_speed: float = 31, length: float = 21,
                  max_acceleration: float = 8, max_angle: float = 30, angle: float = 0):
         super().__init__(x, y, length, speed, acceleration, max_speed, max_acceleration, max_angle, angle)
 
 
 class Car(Vehicle):
+    __slots__ = ()
+
     def __init__(self, x: float, y: float, speed: float, acceleration: float, max_speed: float = 54, length: float = 5,
                  max_acceleration: float = 15, max_angle: float = 45, angle: float = 0):
         super().__init__(x, y, length, speed, acceleration, max_speed, max_acceleration, max_angle, angle)
 
 
 class Motorcycle(Vehicle):
+    __slots__ = ()
+
     def __init__(self, x: float, y: float, speed: float, acceleration: float, max_speed: float = 45, length: float = 3,
                  max_acceleration: float = 8, max_angle: float = 30, angle: float = 0):
         super().__init__(x, y, length, speed, acceleration, max_speed, max_acceleration, max_angle, angle)
@@ -1,8 +1,3 @@
-import time
-import pygame
-import constants
-
-pygame.init()
 import dataclasses
 
 
@@ -12,30 +7,20 @@ class Visual:
     locations: list[tuple]
 
 
-class Window:
-    def __init__(self, global_objects_list):
-        self.global_objects_list = global_objects_list
-        self.screen = pygame.display.set_mode((constants.WINDOW_WIDTH, constants.WINDOW_HEIGHT))
-        self.clock = pygame.time.Clock()
-
-    def update(self, the_time):
-        obj_visuals = self.global_objects_list.draw()
-        self.screen.fill(constants.BACKGROUND)
-        for obj in obj_visuals:
-            pygame.draw.polygon(self.screen, obj.color,
-                                obj.locations)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return False
-        pygame.display.flip()
-        self.clock.tick(60)
-        return True
-
-
-'''if __name__ == "__main__":
-    w = Window()
-    running = True
-    while running:
-        time.sleep(0.02)
-        running = w.update(0)
-    pygame.quit()'''
+def vehicle_visual(color: tuple, x: float, y: float, length: float, width: float, angle: float) -> Visual:
+    """ The rectangle of a vehicle whose front is at (x, y), in world coordinates """
+    if angle % 180 == 90:
+        length, width = width, length
+    half_length = length / 2
+    half_width = width / 2
+    top_left_x = x + half_length
+    bottom_left_x = x - half_length
+    top_right_x = x + half_length
+    bottom_right_x = x - half_length
+    top_left_y = y - half_width
+    top_right_y = y + half_width
+    bottom_left_y = y - half_width
+    bottom_right_y = y + half_width
+    return Visual(color,
+                  [(top_left_x, top_left_y), (top_right_x, top_right_y), (bottom_right_x, bottom_right_y),
+                   (bottom_left_x, bottom_left_y)])